@@ -2,13 +2,18 @@ import time
 import streamlit as st
 import sqlite3
 import altair as alt
+import pandas as pd
 from langchain_core.messages import HumanMessage
-from backend.db_manager import DBManager
+from backend.db_manager import get_db_manager
+from backend.streaming import stream_agent
+from backend.tracing import tracer
 from backend.sqlite_agent import (
     recreate_agent,
     create_default_tools,
     create_extraction_chain,
     create_llm,
+    extraction_cache,
+    fast_extractor,
 )
 
 st.set_page_config(layout="wide")
@@ -20,15 +25,34 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "agent_created" not in st.session_state:
     st.session_state.agent_created = False
+if "watermarks" not in st.session_state:
+    st.session_state.watermarks = None
 
 
-# Load data from database
+# Load data from database: only rows added since the last load are read and
+# appended to the cached frames. Any write from outside this process's
+# DBManager (another process, a custom tool's own connection) may have updated
+# or deleted rows, so it reloads everything. The dashboard and the agent's tools share the
+# process-wide DBManager, so a refresh opens no connection and runs no DDL.
 def load_data():
-    db_manager = DBManager("customer_database.db")
-    members = db_manager.list_all_members()
-    products = db_manager.list_all_products()
-    records = db_manager.list_all_records()
-    return members, products, records
+    changes, st.session_state.watermarks, reloaded = get_db_manager().changes_since(
+        st.session_state.watermarks
+    )
+    if reloaded or st.session_state.data is None:
+        return changes["member"], changes["product"]
+
+    members, products = st.session_state.data
+    return tuple(
+        (
+            pd.concat([frame, changes[table]], ignore_index=True)
+            if not changes[table].empty
+            else frame
+        )
+        for frame, table in [
+            (members, "member"),
+            (products, "product"),
+        ]
+    )
 
 
 # Refresh data
@@ -36,13 +60,20 @@ def refresh_data():
     st.session_state.data = load_data()
 
 
+# The Refresh button always rereads every row
+def reload_data():
+    st.session_state.watermarks = None
+    st.session_state.data = None
+    refresh_data()
+
+
 # Load initial data if not loaded
 if st.session_state.data is None:
     refresh_data()
 
 st.sidebar.header("Model Configuration")
 model_provider = st.sidebar.selectbox(
-    "Select Model Provider", ["OpenAI", "Ollama", "Bedrock"]
+    "Select Model Provider", ["OpenAI", "Ollama", "Bedrock", "Fake"]
 )
 
 
@@ -75,13 +106,33 @@ def bedrock_inputs():
     }
 
 
+def fake_inputs():
+    latency = st.sidebar.number_input(
+        "Latency per call (s)", min_value=0.0, value=0.5, step=0.1
+    )
+    tokens_per_second = st.sidebar.number_input(
+        "Output tokens per second (0 = instant)", min_value=0.0, value=50.0
+    )
+    st.sidebar.info(
+        "The fake model answers from simple rules without network access, for "
+        "trying the app and benchmarking offline."
+    )
+    return {
+        "latency": latency,
+        "latency_jitter": 0.3,
+        "tokens_per_second": tokens_per_second,
+    }
+
+
 # Display appropriate inputs based on selected provider
 if model_provider == "OpenAI":
     model_args = openai_inputs()
 elif model_provider == "Ollama":
     model_args = ollama_inputs()
-else:  # Bedrock
+elif model_provider == "Bedrock":
     model_args = bedrock_inputs()
+else:  # Fake
+    model_args = fake_inputs()
 
 
 def create_agent():
@@ -92,7 +143,9 @@ def create_agent():
         st.session_state.extraction_chain = create_extraction_chain(
             llm=st.session_state.llm
         )
-        st.session_state.tools = create_default_tools(st.session_state.extraction_chain)
+        st.session_state.tools = create_default_tools(
+            st.session_state.extraction_chain, db_manager=get_db_manager()
+        )
         st.session_state.tool_descriptions = {
             tool.name: tool.description for tool in st.session_state.tools
         }
@@ -106,6 +159,26 @@ def create_agent():
 if st.sidebar.button("Create Agent"):
     create_agent()
 
+cache_stats = extraction_cache.stats()
+st.sidebar.caption(
+    f"Extraction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+    f"({cache_stats['hit_rate']:.0%}), ~{cache_stats['saved_llm_seconds']:.1f}s of "
+    "LLM time saved"
+)
+query_cache_stats = get_db_manager().cache_stats()
+st.sidebar.caption(
+    f"Query result cache: {query_cache_stats['hits']} hits / "
+    f"{query_cache_stats['misses']} misses ({query_cache_stats['hit_rate']:.0%}), "
+    f"{query_cache_stats['entries']} results in "
+    f"{query_cache_stats['bytes'] / 1024 / 1024:.1f} of "
+    f"{query_cache_stats['max_bytes'] / 1024 / 1024:.0f} MB"
+)
+fast_path_stats = fast_extractor.stats()
+st.sidebar.caption(
+    f"Fast-path extraction: {fast_path_stats['served']} served without the LLM "
+    f"({fast_path_stats['served_share']:.0%} of requests)"
+)
+
 # App layout
 st.markdown(
     "<h1 style='text-align: center;'>SQLite Agent Demo</h1>", unsafe_allow_html=True
@@ -115,28 +188,32 @@ col1, col2 = st.columns(2)
 with col1:
     try:
         # Use data from session state
-        members, products, records = st.session_state.data
+        members, products = st.session_state.data
 
         # Purchase records
         st.markdown("<h2>🛒 Purchase Records</h2>", unsafe_allow_html=True)
+        # Per member and product totals are kept up to date by triggers, so this
+        # reads members x products rows however many records there are
+        totals = get_db_manager().member_product_totals()
         countries = st.multiselect(
             "Choose Members for Purchase Records",
-            list(records["member_name"].unique()),
-            list(records["member_name"].unique())[:2],
+            list(totals["member_name"].unique()),
+            list(totals["member_name"].unique())[:2],
         )
 
         if not countries:
             st.error("Please select at least one member.")
         else:
-            data = records[records["member_name"].isin(countries)]
+            data = totals[totals["member_name"].isin(countries)]
 
+            # Totals are keyed by product id, so products sharing a name are summed
             pivot_data = data.pivot_table(
                 index="member_name",
                 columns="product_name",
                 values="number",
                 aggfunc="sum",
                 fill_value=0,
-            )
+            ).astype(int)
             st.markdown("### Records of Selected Members")
             st.dataframe(pivot_data, use_container_width=True)
 
@@ -188,7 +265,7 @@ with col1:
         st.error(f"Database connection error: {e}")
 
     # Refresh button
-    st.button("🔄 Refresh Data", on_click=refresh_data, use_container_width=True)
+    st.button("🔄 Refresh Data", on_click=reload_data, use_container_width=True)
 
 with col2:
     if st.session_state.agent_created:
@@ -207,10 +284,11 @@ with col2:
                 with st.chat_message(message["role"]):
                     st.markdown(message["content"])
 
-        def response_generator(response):
-            for word in response:
-                yield word
-                time.sleep(0.01)
+            if "last_first_token_ms" in st.session_state:
+                st.caption(
+                    "First token of the last reply after "
+                    f"{st.session_state.last_first_token_ms:.0f} ms"
+                )
 
     else:
         st.info(
@@ -227,29 +305,55 @@ if prompt:
 
     st.session_state.messages.append({"role": "user", "content": prompt})
 
-    # Handle streaming messages
-    with chat_container:
+    # Handle streaming messages: the agent's tokens are rendered as the model
+    # produces them and tool results as soon as the tool returns. The request
+    # is traced: each graph step is recorded with the LLM calls, extractions
+    # and queries made during it, and time to first token is measured.
+    with chat_container, tracer.span(
+        "agent.request", "request", prompt=prompt
+    ) as request_span:
         with st.chat_message("assistant"):
-            response = ""
-            for step in st.session_state.agent.stream(
-                {"messages": [HumanMessage(content=prompt)]}, stream_mode="updates"
+            responses = []
+            streamed, placeholder = "", None
+            first_token_ms = None
+            request_clock = time.perf_counter()
+            step_start, step_clock = time.time(), time.perf_counter()
+            for kind, event in stream_agent(
+                st.session_state.agent, {"messages": [HumanMessage(content=prompt)]}
             ):
-                if "agent" in step:
-                    messages = step["agent"]["messages"]
-                    for message in messages:
+                if kind == "token":
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - request_clock) * 1000
+                    if placeholder is None:
+                        placeholder = st.empty()
+                    streamed += event
+                    placeholder.markdown(streamed + "▌")
+                    continue
+
+                for node in event:
+                    tracer.record(
+                        f"agent.step.{node}",
+                        "step",
+                        step_start,
+                        (time.perf_counter() - step_clock) * 1000,
+                        parent=request_span,
+                    )
+                if "agent" in event:
+                    for message in event["agent"]["messages"]:
                         if message.tool_calls:
                             tool_call = message.tool_calls[0]
                             step_response = f'**Calling `{tool_call["name"]}` tool...**'
-                            st.markdown(step_response)
                         else:
                             step_response = message.content
-                            step_response = st.write_stream(
-                                response_generator(step_response)
-                            )
+                        if placeholder is not None:
+                            placeholder.markdown(step_response)
+                        else:
+                            st.markdown(step_response)
+                        responses.append(step_response)
+                        streamed, placeholder = "", None
 
-                elif "tools" in step:
-                    messages = step["tools"]["messages"]
-                    for message in messages:
+                elif "tools" in event:
+                    for message in event["tools"]["messages"]:
                         if "tool_call" in locals() and tool_call["name"] in [
                             "ViewAllProducts",
                             "ViewAllMembers",
@@ -259,17 +363,13 @@ if prompt:
                                 + "\n\n"
                                 + "Retrieving data from database..."
                             )
-                            step_response = st.write_stream(
-                                response_generator(step_response)
-                            )
                         else:
                             step_response = (
                                 "**Tool Message:**" + "\n\n" + message.content
                             )
-                            step_response = st.write_stream(
-                                response_generator(step_response)
-                            )
                             refresh_data()
+                        st.markdown(step_response)
+                        responses.append(step_response)
 
                         # refresh data
                         if "tool_call" in locals() and tool_call["name"] in [
@@ -278,11 +378,13 @@ if prompt:
                         ]:
                             st.success("Database updated! Data refreshed.")
 
-                if response == "":
-                    response += step_response
-                else:
-                    response += "\n\n" + step_response
+                step_start, step_clock = time.time(), time.perf_counter()
+
+            if first_token_ms is not None:
+                request_span["attributes"]["time_to_first_token_ms"] = first_token_ms
+                st.session_state.last_first_token_ms = first_token_ms
 
+            response = "\n\n".join(responses)
             st.session_state.messages.append({"role": "assistant", "content": response})
             st.rerun()
 
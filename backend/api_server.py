@@ -0,0 +1,330 @@
+"""HTTP API for the agent, served with aiohttp next to the Streamlit demo.
+
+Every session shares the process-wide DBManager of --database and one compiled
+agent graph; a session only holds its conversation. Agent runs are
+synchronous, so they execute on a thread pool, and at most --max-concurrency
+of them run at once.
+
+Endpoints:
+    GET    /health
+    GET    /tools                      tool names, descriptions and argument schemas
+    POST   /tools/{name}               {"args": {...}} runs one tool directly
+    POST   /sessions                   starts a conversation, returns {"session_id"}
+    GET    /sessions/{id}              the conversation so far
+    DELETE /sessions/{id}
+    POST   /sessions/{id}/chat         {"message": "..."}; with ?stream=1 or
+                                       Accept: text/event-stream, agent steps are
+                                       sent as server-sent events
+
+Usage:
+    python -m backend.api_server --provider Fake --model-args '{"latency": 0.5}'
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from langchain_core.messages import HumanMessage, messages_to_dict
+
+from backend.batch_runner import tool_calls
+from backend.db_manager import get_db_manager
+from backend.fast_extractor import FastExtractor
+from backend.sqlite_agent import (
+    build_agent,
+    create_default_tools,
+    create_extraction_chain,
+    create_llm,
+)
+from backend.tracing import tracer
+
+
+class Session:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.messages = []
+        # One turn at a time, so each turn sees the previous one's messages
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class AgentService:
+    """Sessions, the shared agent and the limits on concurrent agent runs."""
+
+    def __init__(
+        self,
+        llm,
+        db_manager,
+        max_concurrency=8,
+        max_sessions=1000,
+        session_ttl=3600,
+    ):
+        self.llm = llm
+        self.tools = create_default_tools(
+            create_extraction_chain(llm, fast_path=FastExtractor(db_manager)),
+            db_manager,
+        )
+        self.tools_by_name = {tool.name: tool for tool in self.tools}
+        self.agent = build_agent(llm, self.tools)
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.sessions = OrderedDict()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_concurrency)
+
+    def create_session(self):
+        self._expire_sessions()
+        session = Session()
+        self.sessions[session.id] = session
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return session
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise web.HTTPNotFound(
+                text=json.dumps({"error": "Unknown session."}),
+                content_type="application/json",
+            )
+        session.last_used = time.monotonic()
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def _expire_sessions(self):
+        cutoff = time.monotonic() - self.session_ttl
+        for session_id in [
+            s.id for s in self.sessions.values() if s.last_used < cutoff
+        ]:
+            del self.sessions[session_id]
+
+    def _run_turn(self, messages, prompt, on_step=None):
+        # Runs on the thread pool: stream the graph, reporting each step, and
+        # return the full conversation after the turn
+        conversation = list(messages) + [HumanMessage(content=prompt)]
+        with tracer.span("agent.request", "request", prompt=prompt):
+            for step in self.agent.stream(
+                {"messages": conversation}, stream_mode="updates"
+            ):
+                for node, update in step.items():
+                    conversation.extend(update["messages"])
+                    if on_step:
+                        on_step(node, update["messages"])
+        return conversation
+
+    async def chat(self, session, prompt, on_step=None):
+        """Run one turn of a session and return the messages it added."""
+        loop = asyncio.get_running_loop()
+        async with session.lock, self.semaphore:
+            conversation = await loop.run_in_executor(
+                self.executor, self._run_turn, session.messages, prompt, on_step
+            )
+            added = conversation[len(session.messages) :]
+            session.messages = conversation
+        return added
+
+    async def call_tool(self, name, args):
+        tool = self.tools_by_name[name]
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            return await loop.run_in_executor(self.executor, tool.invoke, args)
+
+
+def step_event(node, messages):
+    # JSON payload describing one graph step for the client
+    if node == "tools":
+        return {
+            "node": node,
+            "results": [{"name": m.name, "content": m.content} for m in messages],
+        }
+    return {
+        "node": node,
+        "tool_calls": [
+            {"name": call["name"], "args": call["args"]}
+            for m in messages
+            for call in m.tool_calls
+        ],
+        "content": "".join(m.content for m in messages if isinstance(m.content, str)),
+    }
+
+
+async def read_json(request):
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        body = None
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": "Expected a JSON object."}),
+            content_type="application/json",
+        )
+    return body
+
+
+routes = web.RouteTableDef()
+
+
+@routes.get("/health")
+async def health(request):
+    service = request.app["service"]
+    return web.json_response({"status": "ok", "sessions": len(service.sessions)})
+
+
+@routes.get("/tools")
+async def list_tools(request):
+    service = request.app["service"]
+    return web.json_response(
+        [
+            {"name": tool.name, "description": tool.description, "args": tool.args}
+            for tool in service.tools
+        ]
+    )
+
+
+@routes.post("/tools/{name}")
+async def run_tool(request):
+    service = request.app["service"]
+    name = request.match_info["name"]
+    if name not in service.tools_by_name:
+        return web.json_response({"error": f"Unknown tool '{name}'."}, status=404)
+    body = await read_json(request)
+    try:
+        result = await service.call_tool(name, body.get("args", {}))
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=400)
+    return web.json_response({"result": result})
+
+
+@routes.post("/sessions")
+async def create_session(request):
+    session = request.app["service"].create_session()
+    return web.json_response({"session_id": session.id}, status=201)
+
+
+@routes.get("/sessions/{session_id}")
+async def get_session(request):
+    session = request.app["service"].get_session(request.match_info["session_id"])
+    return web.json_response(
+        {"session_id": session.id, "messages": messages_to_dict(session.messages)}
+    )
+
+
+@routes.delete("/sessions/{session_id}")
+async def delete_session(request):
+    service = request.app["service"]
+    service.get_session(request.match_info["session_id"])
+    del service.sessions[request.match_info["session_id"]]
+    return web.json_response({"deleted": True})
+
+
+@routes.post("/sessions/{session_id}/chat")
+async def chat(request):
+    service = request.app["service"]
+    session = service.get_session(request.match_info["session_id"])
+    body = await read_json(request)
+    prompt = body.get("message")
+    if not prompt:
+        return web.json_response({"error": "A message is required."}, status=400)
+
+    streaming = request.query.get("stream") == "1" or "text/event-stream" in (
+        request.headers.get("Accept", "")
+    )
+    start = time.perf_counter()
+    if not streaming:
+        added = await service.chat(session, prompt)
+        return web.json_response(
+            {
+                "response": added[-1].content,
+                "tool_calls": tool_calls(added),
+                "latency_s": round(time.perf_counter() - start, 4),
+            }
+        )
+
+    # Server-sent events: one "step" event per graph step, then "done"
+    response = web.StreamResponse(
+        headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+    )
+    await response.prepare(request)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_step(node, messages):
+        loop.call_soon_threadsafe(events.put_nowait, step_event(node, messages))
+
+    turn = asyncio.ensure_future(service.chat(session, prompt, on_step))
+    turn.add_done_callback(lambda _: events.put_nowait(None))
+    while (event := await events.get()) is not None:
+        await response.write(f"event: step\ndata: {json.dumps(event)}\n\n".encode())
+    try:
+        added = turn.result()
+        done = {
+            "response": added[-1].content,
+            "latency_s": round(time.perf_counter() - start, 4),
+        }
+        await response.write(f"event: done\ndata: {json.dumps(done)}\n\n".encode())
+    except Exception as e:
+        error = json.dumps({"error": str(e)})
+        await response.write(f"event: error\ndata: {error}\n\n".encode())
+    await response.write_eof()
+    return response
+
+
+def create_app(
+    llm,
+    db_manager=None,
+    max_concurrency=8,
+    max_sessions=1000,
+    session_ttl=3600,
+):
+    app = web.Application()
+    app.add_routes(routes)
+
+    async def start_service(app):
+        # Created inside the running loop, which owns the semaphore and locks
+        app["service"] = AgentService(
+            llm,
+            db_manager or get_db_manager(),
+            max_concurrency,
+            max_sessions,
+            session_ttl,
+        )
+        yield
+        app["service"].executor.shutdown(wait=False)
+
+    app.cleanup_ctx.append(start_service)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--provider", default="OpenAI")
+    parser.add_argument(
+        "--model-args", default="{}", help="JSON object passed to create_llm"
+    )
+    parser.add_argument("--database", default="customer_database.db")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument(
+        "--session-ttl", type=float, default=3600, help="seconds of inactivity"
+    )
+    args = parser.parse_args()
+
+    llm = create_llm(args.provider, json.loads(args.model_args))
+    app = create_app(
+        llm,
+        get_db_manager(args.database),
+        args.max_concurrency,
+        args.max_sessions,
+        args.session_ttl,
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Run prompts from a JSONL file through the agent without the Streamlit UI.
+
+Each input line is a JSON object holding the prompt (field "prompt" by
+default) and optionally an id. Prompts run as independent conversations on a
+thread pool; every result is appended to the output file as soon as it
+finishes, with the response, latency and the tool calls the agent made.
+
+Usage:
+    python -m backend.batch_runner prompts.jsonl -o results.jsonl \\
+        --provider OpenAI --model-args '{"api_key": "...", "model_name": "gpt-4o-mini"}' \\
+        --concurrency 8
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from backend.db_manager import get_db_manager
+from backend.fast_extractor import FastExtractor
+from backend.sqlite_agent import (
+    build_agent,
+    create_default_tools,
+    create_extraction_chain,
+    create_llm,
+)
+from backend.tracing import tracer
+
+
+def read_prompts(path, prompt_field="prompt", id_field="id"):
+    """Return [(id, prompt)] from a JSONL file; ids default to the line number."""
+    prompts = []
+    with open(path) as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if prompt_field not in item:
+                raise ValueError(f"Line {number} has no '{prompt_field}' field.")
+            prompts.append((item.get(id_field, number), item[prompt_field]))
+    return prompts
+
+
+def tool_calls(messages):
+    # Pair each tool call the agent made with the tool's result
+    results = {
+        m.tool_call_id: m.content for m in messages if isinstance(m, ToolMessage)
+    }
+    return [
+        {"name": call["name"], "args": call["args"], "result": results.get(call["id"])}
+        for m in messages
+        if isinstance(m, AIMessage)
+        for call in m.tool_calls
+    ]
+
+
+def run_prompt(agent, prompt_id, prompt):
+    """Run one prompt as a new conversation and return its result record."""
+    start = time.perf_counter()
+    record = {"id": prompt_id, "prompt": prompt}
+    try:
+        with tracer.span("agent.request", "request", prompt=prompt, id=prompt_id):
+            result = agent.invoke({"messages": [HumanMessage(content=prompt)]})
+        messages = result["messages"]
+        record["response"] = messages[-1].content
+        record["tool_calls"] = tool_calls(messages)
+        record["error"] = None
+    except Exception as e:
+        record["response"] = None
+        record["tool_calls"] = []
+        record["error"] = repr(e)
+    record["latency_s"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def run_batch(agent, prompts, output, concurrency=4):
+    """Run prompts on a thread pool, appending each result to the output file."""
+    records = []
+    start = time.perf_counter()
+    with open(output, "a") as f, ThreadPoolExecutor(concurrency) as pool:
+        futures = [
+            pool.submit(run_prompt, agent, prompt_id, prompt)
+            for prompt_id, prompt in prompts
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            records.append(record)
+    return records, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file with one prompt per line")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl")
+    parser.add_argument("--provider", default="OpenAI")
+    parser.add_argument(
+        "--model-args", default="{}", help="JSON object passed to create_llm"
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--trace", help="also append every span to this JSONL file")
+    parser.add_argument("--database", default="customer_database.db")
+    args = parser.parse_args()
+
+    prompts = read_prompts(args.input, args.prompt_field, args.id_field)
+    if args.trace:
+        tracer.path = args.trace
+
+    llm = create_llm(args.provider, json.loads(args.model_args))
+    db_manager = get_db_manager(args.database)
+    extraction_chain = create_extraction_chain(llm, fast_path=FastExtractor(db_manager))
+    agent = build_agent(llm, create_default_tools(extraction_chain, db_manager))
+    records, elapsed = run_batch(agent, prompts, args.output, args.concurrency)
+
+    latencies = sorted(r["latency_s"] for r in records)
+    errors = sum(1 for r in records if r["error"])
+    print(
+        f"{len(records)} prompts in {elapsed:.1f}s "
+        f"({len(records) / elapsed:.2f}/s, concurrency {args.concurrency}), "
+        f"{errors} errors"
+    )
+    if latencies:
+        p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+        print(
+            f"latency median {statistics.median(latencies):.2f}s, p95 {p95:.2f}s; "
+            f"results appended to {args.output}"
+        )
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
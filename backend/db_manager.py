@@ -1,37 +1,110 @@
+import contextvars
+import difflib
+import functools
+import pathlib
+import queue
+import re
 import sqlite3
-import pandas as pd
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 
+from backend.tracing import annotate, current_span, tracer
 
-class DBManager:
-    def __init__(self, db_name="customer_database.db"):
-        # Connect to the database
-        self.db_name = db_name
-        self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        self.cursor = self.conn.cursor()
 
-    def create_tables(self):
-        # Create 'member', 'product', and 'record' tables
-        self.cursor.execute(
+# Named performance profiles. "pragmas" are applied to every connection, in order.
+PROFILES = {
+    "default": {
+        "pragmas": {},
+        "checkpoint_interval": None,
+        "optimize_on_close": False,
+    },
+    "production": {
+        "pragmas": {
+            "busy_timeout": 5000,
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -64 * 1024,  # negative means KiB, i.e. 64 MiB
+            "temp_store": "MEMORY",
+        },
+        # Seconds between passive WAL checkpoints, checked after each write
+        "checkpoint_interval": 30,
+        "optimize_on_close": True,
+    },
+}
+
+
+# RETURNING, used by the insert methods, needs SQLite 3.35
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+
+def _has_trigram_fts(conn):
+    # Whether this SQLite build has FTS5, which the trigram name indexes need
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(name, tokenize='trigram')"
+        )
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.trigram_probe")
+    return True
+
+
+def _if_trigram_fts(*statements):
+    # A migration step running statements only where FTS5 is available
+    def step(conn):
+        if _has_trigram_fts(conn):
+            for statement in statements:
+                conn.execute(statement)
+
+    return step
+
+
+def _check_member_names(conn):
+    # Refuse to merge different people who share a name
+    names = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT name FROM member GROUP BY name
+            HAVING COUNT(DISTINCT email) > 1 OR COUNT(DISTINCT age) > 1
             """
+        )
+    ]
+    if names:
+        raise sqlite3.IntegrityError(
+            f"Member names must be unique, but {names} belong to members with "
+            "different emails or ages. Rename these members, then restart."
+        )
+
+
+# Schema migrations tracked with PRAGMA user_version: entry i brings a database
+# from version i to version i + 1. Released entries must never change; append
+# a new one instead. Databases created before versioning are at version 0 and
+# already match migration 1, which is why it uses IF NOT EXISTS. A step may
+# also be a function taking the connection.
+MIGRATIONS = [
+    # 1: member, product and record tables
+    [
+        """
         CREATE TABLE IF NOT EXISTS member (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             email TEXT NOT NULL,
             age INTEGER NOT NULL
         )
+        """,
         """
-        )
-        self.cursor.execute(
-            """
         CREATE TABLE IF NOT EXISTS product (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             price REAL NOT NULL
         )
+        """,
         """
-        )
-        self.cursor.execute(
-            """
         CREATE TABLE IF NOT EXISTS record (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             member_id INTEGER,
@@ -40,14 +113,642 @@ class DBManager:
             FOREIGN KEY (member_id) REFERENCES member(id),
             FOREIGN KEY (product_id) REFERENCES product(id)
         )
+        """,
+    ],
+    # 2: lookup indexes for the name searches and the per-member record join.
+    # The record index covers every record column get_member_records reads.
+    [
+        "CREATE INDEX IF NOT EXISTS idx_member_name ON member(name)",
+        "CREATE INDEX IF NOT EXISTS idx_product_name ON product(name)",
+        """
+        CREATE INDEX IF NOT EXISTS idx_record_member
+        ON record(member_id, product_id, number)
+        """,
+    ],
+    # 3: member x product purchase totals kept up to date by triggers on record
+    [
+        """
+        CREATE TABLE member_product_totals (
+            member_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            number INTEGER NOT NULL,
+            PRIMARY KEY (member_id, product_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER record_totals_insert AFTER INSERT ON record
+        BEGIN
+            INSERT INTO member_product_totals (member_id, product_id, number)
+            SELECT NEW.member_id, NEW.product_id, COALESCE(NEW.number, 0)
+            WHERE NEW.member_id IS NOT NULL AND NEW.product_id IS NOT NULL
+            ON CONFLICT (member_id, product_id)
+            DO UPDATE SET number = number + excluded.number;
+        END
+        """,
+        """
+        CREATE TRIGGER record_totals_delete AFTER DELETE ON record
+        BEGIN
+            UPDATE member_product_totals SET number = number - COALESCE(OLD.number, 0)
+            WHERE member_id = OLD.member_id AND product_id = OLD.product_id;
+        END
+        """,
+        """
+        CREATE TRIGGER record_totals_update
+        AFTER UPDATE OF member_id, product_id, number ON record
+        BEGIN
+            UPDATE member_product_totals SET number = number - COALESCE(OLD.number, 0)
+            WHERE member_id = OLD.member_id AND product_id = OLD.product_id;
+            INSERT INTO member_product_totals (member_id, product_id, number)
+            SELECT NEW.member_id, NEW.product_id, COALESCE(NEW.number, 0)
+            WHERE NEW.member_id IS NOT NULL AND NEW.product_id IS NOT NULL
+            ON CONFLICT (member_id, product_id)
+            DO UPDATE SET number = number + excluded.number;
+        END
+        """,
+        """
+        INSERT INTO member_product_totals (member_id, product_id, number)
+        SELECT member_id, product_id, SUM(COALESCE(number, 0))
+        FROM record
+        WHERE member_id IS NOT NULL AND product_id IS NOT NULL
+        GROUP BY member_id, product_id
+        """,
+    ],
+    # 4: case-insensitive name indexes and trigram full-text indexes over member
+    # and product names for fuzzy lookups, kept in sync by triggers. SQLite
+    # builds without FTS5 skip the full-text indexes.
+    [
+        "CREATE INDEX idx_member_name_nocase ON member(name COLLATE NOCASE)",
+        "CREATE INDEX idx_product_name_nocase ON product(name COLLATE NOCASE)",
+        _if_trigram_fts(
+            """
+        CREATE VIRTUAL TABLE member_name_fts USING fts5(
+            name, content='member', content_rowid='id', tokenize='trigram'
+        )
+        """,
+            """
+        CREATE TRIGGER member_name_fts_insert AFTER INSERT ON member
+        BEGIN
+            INSERT INTO member_name_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+        """,
+            """
+        CREATE TRIGGER member_name_fts_delete AFTER DELETE ON member
+        BEGIN
+            INSERT INTO member_name_fts (member_name_fts, rowid, name)
+            VALUES ('delete', OLD.id, OLD.name);
+        END
+        """,
+            """
+        CREATE TRIGGER member_name_fts_update AFTER UPDATE OF name ON member
+        BEGIN
+            INSERT INTO member_name_fts (member_name_fts, rowid, name)
+            VALUES ('delete', OLD.id, OLD.name);
+            INSERT INTO member_name_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+        """,
+            "INSERT INTO member_name_fts (member_name_fts) VALUES ('rebuild')",
+            """
+        CREATE VIRTUAL TABLE product_name_fts USING fts5(
+            name, content='product', content_rowid='id', tokenize='trigram'
+        )
+        """,
+            """
+        CREATE TRIGGER product_name_fts_insert AFTER INSERT ON product
+        BEGIN
+            INSERT INTO product_name_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+        """,
+            """
+        CREATE TRIGGER product_name_fts_delete AFTER DELETE ON product
+        BEGIN
+            INSERT INTO product_name_fts (product_name_fts, rowid, name)
+            VALUES ('delete', OLD.id, OLD.name);
+        END
+        """,
+            """
+        CREATE TRIGGER product_name_fts_update AFTER UPDATE OF name ON product
+        BEGIN
+            INSERT INTO product_name_fts (product_name_fts, rowid, name)
+            VALUES ('delete', OLD.id, OLD.name);
+            INSERT INTO product_name_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+        """,
+            "INSERT INTO product_name_fts (product_name_fts) VALUES ('rebuild')",
+        ),
+    ],
+    # 5: unique member names for get_or_create_member. A member added twice
+    # with the same email and age is merged into the oldest row, records
+    # included; members sharing a name with different details stop the
+    # migration until they are renamed.
+    [
+        _check_member_names,
         """
+        UPDATE record SET member_id = (
+            SELECT MIN(keep.id) FROM member AS duplicate
+            JOIN member AS keep ON keep.name = duplicate.name
+            WHERE duplicate.id = record.member_id
         )
-        self.conn.commit()
+        WHERE member_id IN (
+            SELECT id FROM member
+            WHERE id NOT IN (SELECT MIN(id) FROM member GROUP BY name)
+        )
+        """,
+        "DELETE FROM member WHERE id NOT IN (SELECT MIN(id) FROM member GROUP BY name)",
+        "DROP INDEX idx_member_name",
+        "CREATE UNIQUE INDEX idx_member_name ON member(name)",
+    ],
+    # 6: get_member_records returns records in insertion order. With id right
+    # after member_id the index still covers the query and needs no sort.
+    [
+        "DROP INDEX idx_record_member",
+        """
+        CREATE INDEX idx_record_member
+        ON record(member_id, id, product_id, number)
+        """,
+    ],
+]
+
+
+# Columns page_rows may return, per table
+PAGEABLE_COLUMNS = {
+    "member": ["id", "name", "email", "age"],
+    "product": ["id", "name", "price"],
+}
+MAX_PAGE_SIZE = 100
+
+# Tables read_query may read. Plans that scan all of one of them are rejected
+# once it holds more than FULL_SCAN_ROW_LIMIT rows, and queries are interrupted
+# after QUERY_TIMEOUT seconds.
+QUERYABLE_TABLES = ("member", "product", "record", "member_product_totals")
+FULL_SCAN_ROW_LIMIT = 50_000
+QUERY_TIMEOUT = 2.0
+# Matches "FROM record r", "JOIN member AS m", ... to map aliases to tables
+TABLE_ALIAS_PATTERN = re.compile(
+    rf"\b({'|'.join(QUERYABLE_TABLES)})\s+(?:AS\s+)?(\w+)", re.IGNORECASE
+)
+
+
+# Statements run by the traced DBManager call in progress in this context
+_statements = contextvars.ContextVar("db_statements", default=None)
+# SQL texts kept per traced call; executemany can run one statement per row
+MAX_TRACED_STATEMENTS = 20
+
+
+def _append_statement(sql):
+    statements = _statements.get()
+    if statements is None:
+        return
+    # Trigger programs are reported with the text of the statement firing them
+    if statements["last"] == sql:
+        return
+    statements["last"] = sql
+    statements["count"] += 1
+    if len(statements["sql"]) < MAX_TRACED_STATEMENTS:
+        statements["sql"].append(sql)
+
+
+def _row_count(result):
+    if result is None:
+        return 0
+    if isinstance(result, list) or hasattr(result, "columns"):  # DataFrame
+        return len(result)
+    if isinstance(result, dict) and "rows" in result:
+        return len(result["rows"])
+    if isinstance(result, tuple) and result and isinstance(result[0], dict):
+        # changes_since: (frames by table, watermarks, reloaded)
+        return sum(len(frame) for frame in result[0].values())
+    return 1
+
+
+def _authorize_read(action, arg1, arg2, db_name, trigger):
+    # Authorizer of read_query connections: plain SELECTs over the queryable
+    # tables, with functions and recursive CTEs; anything else is denied
+    if action in (
+        sqlite3.SQLITE_SELECT,
+        sqlite3.SQLITE_FUNCTION,
+        sqlite3.SQLITE_RECURSIVE,
+    ):
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_READ and (arg1 in QUERYABLE_TABLES or db_name is None):
+        # A read without a database name is of a CTE, not a table
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def _read_frame(conn, sql, params=None):
+    # pandas takes about a second to import, so only the methods returning
+    # DataFrames load it, not every process that imports DBManager
+    import pandas as pd
+
+    return pd.read_sql_query(sql, conn, params=params or None)
+
+
+def _result_size(result):
+    # Approximate memory held by a cached result
+    if hasattr(result, "columns"):  # DataFrame
+        # Summed from the column arrays: DataFrame.memory_usage costs about a
+        # millisecond even for a single row
+        size = 0
+        for column in result.columns:
+            values = result[column].to_numpy()
+            size += values.nbytes
+            if values.dtype == object:
+                size += sum(sys.getsizeof(value) for value in values)
+        return size
+    return sys.getsizeof(result) + sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        for row in result
+    )
+
+
+def _copy_result(result):
+    # Callers get their own copy, so changing it cannot alter the cache
+    return result.copy()
+
+
+class QueryCache:
+    """Bounded LRU cache of read results, keyed by SQL and parameters.
+
+    Every lookup passes the current database version. When it differs from
+    the version the entries were read at, the whole cache is dropped: a write
+    may touch any table, and the dashboard reads rarely outlive one anyway.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (sql, params) -> (result, size)
+        self._version = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key, version):
+        # Return (found, result) for a lookup at the given database version
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, version, result):
+        # Store a result read at the given version; results larger than the
+        # whole cache are not kept
+        size = _result_size(result)
+        with self._lock:
+            self._check_version(version)
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and the memory the cached results hold."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def _fetch_all(conn, sql, params=()):
+    return conn.execute(sql, params).fetchall()
+
+
+def traced_query(method):
+    # Inside a trace, record the call as a span with the SQL it ran, the rows
+    # it returned and its duration; outside one, call straight through
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if current_span() is None:
+            return method(self, *args, **kwargs)
+        with tracer.span(f"db.{method.__name__}", "db") as span:
+            statements = {"sql": [], "count": 0, "last": None}
+            token = _statements.set(statements)
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                _statements.reset(token)
+                span["attributes"]["sql"] = statements["sql"]
+                span["attributes"]["statements"] = statements["count"]
+            span["attributes"]["rows"] = _row_count(result)
+            return result
+
+    return wrapper
+
+
+class DBManager:
+    def __init__(
+        self,
+        db_name="customer_database.db",
+        pool_size=None,
+        profile="default",
+        group_commit_ms=None,
+        result_cache_mb=None,
+    ):
+        # Connect to the database. With pool_size set, reads check out one of
+        # pool_size reader connections and self.conn becomes the dedicated writer.
+        # With group_commit_ms set, writes from concurrent callers are committed
+        # together: a writer with others queued behind it waits up to
+        # group_commit_ms for them to join its commit.
+        # With result_cache_mb set, the list_all_* methods, get_member_records
+        # and member_product_totals keep their results until the data changes.
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(
+                f"SQLite {sqlite3.sqlite_version} is too old, DBManager needs "
+                f"{'.'.join(map(str, MIN_SQLITE_VERSION))} or newer"
+            )
+        if profile not in PROFILES:
+            raise ValueError(
+                f"Unknown profile '{profile}', expected one of {list(PROFILES)}"
+            )
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self.profile = profile
+        self._settings = PROFILES[profile]
+        self._last_checkpoint = time.monotonic()
+        self.conn = self._connect()
+        # Kept for custom tools that use the cursor directly; DBManager methods
+        # always open their own cursor.
+        self.cursor = self.conn.cursor()
+        # Guards the writer connection (and every call when not pooled)
+        self._lock = threading.RLock()
+        self._tx_depth = 0
+        self._readers = None
+        if pool_size:
+            if db_name == ":memory:":
+                raise ValueError("A pooled DBManager needs a database file.")
+            self._readers = queue.Queue(maxsize=pool_size)
+            for _ in range(pool_size):
+                self._readers.put(self._connect())
+        # Read-only connections for read_query, opened on first use
+        self._query_conns = queue.Queue()
+
+        # Result cache. Its version combines a counter of this DBManager's
+        # writes, which covers uncommitted ones, with PRAGMA data_version on a
+        # connection of its own, which changes whenever any other connection
+        # (this DBManager's writer, another DBManager or another process)
+        # commits.
+        self._writes = 0
+        self._result_cache = None
+        self._watch_conn = None
+        self._watch_lock = threading.Lock()
+        if result_cache_mb:
+            self._result_cache = QueryCache(
+                max_bytes=int(result_cache_mb * 1024 * 1024)
+            )
+            if db_name != ":memory:":
+                self._watch_conn = sqlite3.connect(db_name, check_same_thread=False)
+
+        # Group commit state: writers join the open batch, and the last one in
+        # commits it for all of them. _queued counts callers waiting for the
+        # writer lock, i.e. writers that can still join.
+        self.group_commit_ms = group_commit_ms
+        self._commit_cond = threading.Condition(self._lock)
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+        self._pending = False
+        self._batch = 1
+        self._flushed_batch = 0
+        self._flush_errors = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        for pragma, value in self._settings["pragmas"].items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def _data_version(self):
+        # Version of the data the result cache is valid for
+        if self._watch_conn is None:
+            return (self._writes, None)
+        with self._watch_lock:
+            data_version = self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+        return (self._writes, data_version)
+
+    def _cached_read(self, read, sql, params=()):
+        # Run read(conn, sql, params) on a reader connection, or return the
+        # cached result while the data is unchanged. The version is taken
+        # before reading, so a result racing a commit is stored under the
+        # older version and never served after it.
+        if self._result_cache is None:
+            with self._reader() as conn:
+                return read(conn, sql, params)
+        version = self._data_version()
+        key = (sql, tuple(params))
+        found, result = self._result_cache.get(key, version)
+        annotate(result_cache_hit=found)
+        if not found:
+            with self._reader() as conn:
+                result = read(conn, sql, params)
+            self._result_cache.put(key, version, result)
+        return _copy_result(result)
+
+    def cache_stats(self):
+        # Result cache counters and memory, or None without a cache
+        if self._result_cache is None:
+            return None
+        return self._result_cache.stats()
+
+    def _maybe_checkpoint(self):
+        # Fold the WAL back into the database file every checkpoint_interval seconds
+        interval = self._settings["checkpoint_interval"]
+        if interval is None or time.monotonic() - self._last_checkpoint < interval:
+            return
+        self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        self._last_checkpoint = time.monotonic()
+
+    @contextmanager
+    def _reader(self):
+        # Check out a connection for reading
+        if self._readers is None:
+            with self._lock, self._capture(self.conn):
+                yield self.conn
+            return
+        conn = self._readers.get()
+        try:
+            with self._capture(conn):
+                yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def _capture(self, conn):
+        # Collect the statements of a traced call through SQLite's trace hook,
+        # which is only installed while one is running
+        if _statements.get() is None:
+            yield
+            return
+        conn.set_trace_callback(_append_statement)
+        try:
+            yield
+        finally:
+            # transaction() removes it from the writer when the outermost block ends
+            if conn is not self.conn or not self._tx_depth:
+                conn.set_trace_callback(None)
+
+    @contextmanager
+    def _writer(self):
+        # Hold the writer connection and commit once the outermost block succeeds
+        with self._queued_lock:
+            self._queued += 1
+        with self._lock, self._capture(self.conn):
+            with self._queued_lock:
+                self._queued -= 1
+            try:
+                if self._tx_depth:
+                    # Inside transaction(): the outer block commits
+                    yield self.conn
+                    return
+                if not self.group_commit_ms:
+                    try:
+                        yield self.conn
+                    except BaseException:
+                        self.conn.rollback()
+                        raise
+                    self.conn.commit()
+                    self._maybe_checkpoint()
+                    return
+
+                # Group commit: run in a savepoint of the shared open transaction so
+                # a failure only undoes this block, then make sure the batch commits.
+                if not self.conn.in_transaction:
+                    self.conn.execute("BEGIN")
+                self.conn.execute("SAVEPOINT write")
+                try:
+                    yield self.conn
+                except BaseException:
+                    self.conn.execute("ROLLBACK TO write")
+                    self.conn.execute("RELEASE write")
+                    # With no other write in the batch, nobody would commit the
+                    # open transaction, and it would keep the database locked
+                    if not self._pending:
+                        self.conn.rollback()
+                    raise
+                self.conn.execute("RELEASE write")
+                batch = self._batch
+                self._pending = True
+                # A lone writer commits at once. With writers queued for the
+                # lock, wait for them to join (the last one commits for all),
+                # but commit ourselves after group_commit_ms.
+                deadline = time.monotonic() + self.group_commit_ms / 1000
+                while self._flushed_batch < batch:
+                    remaining = deadline - time.monotonic()
+                    if not self._queued or remaining <= 0:
+                        self._flush()
+                        break
+                    self._commit_cond.wait(remaining)
+                if batch in self._flush_errors:
+                    raise self._flush_errors[batch]
+            finally:
+                # Any write, committed or not, invalidates the result cache
+                self._writes += 1
+
+    def _flush(self):
+        # Commit the open group-commit batch and wake the writers waiting on it
+        with self._commit_cond:
+            if not self._pending:
+                return
+            try:
+                self.conn.commit()
+                self._maybe_checkpoint()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                self._flush_errors[self._batch] = e
+                # Waiters of older batches have long since read their error
+                for batch in [b for b in self._flush_errors if b < self._batch - 100]:
+                    del self._flush_errors[batch]
+            self._pending = False
+            self._flushed_batch = self._batch
+            self._batch += 1
+            self._commit_cond.notify_all()
+
+    @contextmanager
+    def transaction(self):
+        # Run every write in the block as one transaction with a single commit.
+        # Nested transaction() blocks join the outermost one.
+        with self._writer():
+            self._tx_depth += 1
+            try:
+                yield self
+            finally:
+                self._tx_depth -= 1
+                if not self._tx_depth:
+                    self.conn.set_trace_callback(None)
+
+    def create_tables(self):
+        # Bring the schema up to date and seed an empty database
+        self.migrate()
         # Check if member table is empty
-        self.cursor.execute("SELECT COUNT(*) FROM member")
-        if self.cursor.fetchone()[0] == 0:
+        with self._reader() as conn:
+            empty = conn.execute("SELECT COUNT(*) FROM member").fetchone()[0] == 0
+        if empty:
             self.insert_example_data()
 
+    def schema_version(self):
+        # Number of MIGRATIONS applied to this database
+        with self._reader() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self):
+        # Apply pending migrations one transaction at a time. BEGIN IMMEDIATE
+        # takes the write lock before reading the version, so two processes
+        # starting together cannot apply the same migration twice.
+        with self._lock:
+            self._flush()
+            while True:
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+                    if version < len(MIGRATIONS):
+                        for statement in MIGRATIONS[version]:
+                            if callable(statement):
+                                statement(self.conn)
+                            else:
+                                self.conn.execute(statement)
+                        self.conn.execute(f"PRAGMA user_version = {version + 1}")
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+                self.conn.commit()
+                if version >= len(MIGRATIONS):
+                    break
+
+    def explain_query_plan(self, sql, params=()):
+        # Return the detail column of EXPLAIN QUERY PLAN for a statement
+        with self._reader() as conn:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[-1] for row in rows]
+
     def insert_example_data(self):
         # Insert some example members
         members = [
@@ -55,94 +756,451 @@ class DBManager:
             ("Bob Smith", "bob@example.com", 30),
             ("Charlie Brown", "charlie@example.com", 22),
         ]
-        self.cursor.executemany(
-            "INSERT INTO member (name, email, age) VALUES (?, ?, ?)", members
-        )
-
         # Insert some example products
         products = [("Laptop", 999.99), ("Smartphone", 499.99), ("Headphones", 199.99)]
-        self.cursor.executemany(
-            "INSERT INTO product (name, price) VALUES (?, ?)", products
-        )
-
         # Insert some example records
         records = [
             (1, 1, 1),  # Alice buys 1 Laptop
             (2, 2, 2),  # Bob buys 2 Smartphones
             (3, 3, 3),  # Charlie buys 3 Headphones
         ]
-        self.cursor.executemany(
-            "INSERT INTO record (member_id, product_id, number) VALUES (?, ?, ?)",
-            records,
-        )
 
-        self.conn.commit()
+        with self.transaction():
+            self.insert_members_many(members)
+            self.insert_products_many(products)
+            self.insert_records_many(records)
 
+    @traced_query
     def insert_member(self, name, email, age):
-        # Insert a new member
-        self.cursor.execute(
-            "INSERT INTO member (name, email, age) VALUES (?, ?, ?)", (name, email, age)
-        )
-        self.conn.commit()
+        # Insert a new member and return the inserted row
+        with self._writer() as conn:
+            return conn.execute(
+                "INSERT INTO member (name, email, age) VALUES (?, ?, ?) RETURNING *",
+                (name, email, age),
+            ).fetchone()
 
+    @traced_query
     def insert_product(self, name, price):
-        # Insert a new product
-        self.cursor.execute(
-            "INSERT INTO product (name, price) VALUES (?, ?)", (name, price)
-        )
-        self.conn.commit()
+        # Insert a new product and return the inserted row
+        with self._writer() as conn:
+            return conn.execute(
+                "INSERT INTO product (name, price) VALUES (?, ?) RETURNING *",
+                (name, price),
+            ).fetchone()
 
+    @traced_query
     def insert_record(self, member_id, product_id, number):
-        # Insert a new purchase record
-        self.cursor.execute(
-            "INSERT INTO record (member_id, product_id, number) VALUES (?, ?, ?)",
-            (member_id, product_id, number),
-        )
-        self.conn.commit()
+        # Insert a new purchase record and return the inserted row
+        with self._writer() as conn:
+            return conn.execute(
+                "INSERT INTO record (member_id, product_id, number) VALUES (?, ?, ?) "
+                "RETURNING *",
+                (member_id, product_id, number),
+            ).fetchone()
+
+    @traced_query
+    def get_or_create_member(self, name, email, age):
+        # Return (member row, created). The insert is skipped by the unique
+        # name index when the member exists; both steps run in one transaction
+        # on the writer connection, so concurrent callers get the same row.
+        with self._writer() as conn:
+            member = conn.execute(
+                "INSERT INTO member (name, email, age) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO NOTHING RETURNING *",
+                (name, email, age),
+            ).fetchone()
+            if member:
+                return member, True
+            member = conn.execute(
+                "SELECT * FROM member WHERE name = ?", (name,)
+            ).fetchone()
+            return member, False
+
+    @traced_query
+    def insert_members_many(self, members):
+        # Insert (name, email, age) rows in a single transaction
+        with self._writer() as conn:
+            conn.executemany(
+                "INSERT INTO member (name, email, age) VALUES (?, ?, ?)", members
+            )
+
+    @traced_query
+    def insert_products_many(self, products):
+        # Insert (name, price) rows in a single transaction
+        with self._writer() as conn:
+            conn.executemany(
+                "INSERT INTO product (name, price) VALUES (?, ?)", products
+            )
 
+    @traced_query
+    def insert_records_many(self, records):
+        # Insert (member_id, product_id, number) rows in a single transaction
+        with self._writer() as conn:
+            conn.executemany(
+                "INSERT INTO record (member_id, product_id, number) VALUES (?, ?, ?)",
+                records,
+            )
+
+    @traced_query
     def get_member_by_name(self, name):
         # Find a member by name
-        self.cursor.execute("SELECT * FROM member WHERE name = ?", (name,))
-        return self.cursor.fetchone()
+        with self._reader() as conn:
+            return conn.execute(
+                "SELECT * FROM member WHERE name = ?", (name,)
+            ).fetchone()
 
+    @traced_query
     def get_product_by_name(self, product_name):
         # Find a product by name
-        self.cursor.execute("SELECT * FROM product WHERE name = ?", (product_name,))
-        return self.cursor.fetchone()
+        with self._reader() as conn:
+            return conn.execute(
+                "SELECT * FROM product WHERE name = ?", (product_name,)
+            ).fetchone()
+
+    @traced_query
+    def find_member(self, name, limit=5, min_score=0.6):
+        # Fuzzy lookup of members by name, best match first
+        return self._find_by_name("member", name, limit, min_score)
+
+    @traced_query
+    def find_product(self, product_name, limit=5, min_score=0.6):
+        # Fuzzy lookup of products by name, best match first
+        return self._find_by_name("product", product_name, limit, min_score)
+
+    def _find_by_name(self, table, name, limit, min_score):
+        # Return [(row, score)] ranked by similarity to name, 1.0 being an exact
+        # case-insensitive match. Candidates come from the cheapest query that
+        # finds any: the case-insensitive name index, then the trigram index
+        # with every trigram, with every trigram of either half of the text
+        # (one typo only breaks one half), and finally with any trigram.
+        # Without the trigram index (no FTS5) every name is a candidate.
+        if not name:
+            return []
+        query = name.strip().lower()
+        trigrams = list(dict.fromkeys(query[i : i + 3] for i in range(len(query) - 2)))
+        terms = ['"' + trigram.replace('"', '""') + '"' for trigram in trigrams]
+        half = (len(terms) + 1) // 2
+        fts_queries = [" AND ".join(terms)] if terms else []
+        if len(terms) > 1:
+            fts_queries += [
+                f"({' AND '.join(terms[:half])}) OR ({' AND '.join(terms[half:])})",
+                " OR ".join(terms),
+            ]
+        fts_sql = f"""
+            SELECT {table}.* FROM {table}_name_fts
+            JOIN {table} ON {table}.id = {table}_name_fts.rowid
+            WHERE {table}_name_fts MATCH ?
+            ORDER BY bm25({table}_name_fts)
+            LIMIT ?
+            """
+        with self._reader() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM {table} WHERE name = ? COLLATE NOCASE LIMIT ?",
+                (query, limit),
+            ).fetchall()
+            if rows:
+                return [(row, 1.0) for row in rows]
+            has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (f"{table}_name_fts",)
+            ).fetchone()
+            if not has_fts:
+                fts_queries = []
+                rows = conn.execute(f"SELECT * FROM {table}").fetchall()
+            for fts_query in fts_queries:
+                rows = conn.execute(fts_sql, (fts_query, limit * 4)).fetchall()
+                if rows:
+                    break
 
+        scored = [
+            (row, difflib.SequenceMatcher(None, query, row[1].lower()).ratio())
+            for row in rows
+        ]
+        scored = [(row, score) for row, score in scored if score >= min_score]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    @traced_query
     def get_member_records(self, member_id):
         # Retrieve all records for a specific member
-        self.cursor.execute(
+        return self._cached_read(
+            _fetch_all,
             """
-        SELECT record.id, product.name, product.price, record.number, product.price*record.number
-        FROM record 
-        JOIN product ON record.product_id = product.id
-        WHERE record.member_id = ?
-        """,
+            SELECT record.id, product.name, product.price, record.number, product.price*record.number
+            FROM record
+            JOIN product ON record.product_id = product.id
+            WHERE record.member_id = ?
+            ORDER BY record.id
+            """,
             (member_id,),
         )
-        return self.cursor.fetchall()
 
+    @traced_query
+    def list_member_names(self):
+        # Retrieve the names of all members
+        with self._reader() as conn:
+            return [row[0] for row in conn.execute("SELECT name FROM member")]
+
+    @traced_query
+    def list_product_names(self):
+        # Retrieve the names of all products
+        with self._reader() as conn:
+            return [row[0] for row in conn.execute("SELECT name FROM product")]
+
+    @traced_query
+    def page_rows(
+        self,
+        table,
+        limit=20,
+        offset=0,
+        after_id=None,
+        name_prefix=None,
+        columns=None,
+    ):
+        # Return one bounded page of member or product rows, ordered by id, plus
+        # the number of rows matching name_prefix. after_id continues from the
+        # next_cursor of the previous page; offset skips rows within the match.
+        if table not in PAGEABLE_COLUMNS:
+            raise ValueError(f"Cannot page table '{table}'")
+        columns = list(columns or PAGEABLE_COLUMNS[table])
+        unknown = set(columns) - set(PAGEABLE_COLUMNS[table])
+        if unknown:
+            raise ValueError(f"Unknown {table} columns: {sorted(unknown)}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        filters, params = [], []
+        if name_prefix:
+            escaped = re.sub(r"([\\%_])", r"\\\1", name_prefix)
+            filters.append("name LIKE ? ESCAPE '\\'")
+            params.append(escaped + "%")
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        page_filters = filters + (["id > ?"] if after_id is not None else [])
+        page_params = params + ([after_id] if after_id is not None else [])
+        page_where = f"WHERE {' AND '.join(page_filters)}" if page_filters else ""
+
+        with self._reader() as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM {table} {where}", params
+            ).fetchone()[0]
+            # Fetch one extra row to know whether another page follows
+            cursor = conn.execute(
+                f"SELECT id, {', '.join(columns)} FROM {table} {page_where} "
+                "ORDER BY id LIMIT ? OFFSET ?",
+                page_params + [limit + 1, max(0, int(offset))],
+            )
+            rows = cursor.fetchmany(limit + 1)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "columns": columns,
+            "rows": [row[1:] for row in rows],
+            "total": total,
+            "next_cursor": rows[-1][0] if has_more else None,
+        }
+
+    @traced_query
     def list_all_members(self):
         # Retrieve all members
-        return pd.read_sql_query("SELECT * FROM member", self.conn)
+        return self._cached_read(_read_frame, "SELECT * FROM member")
 
+    @traced_query
     def list_all_products(self):
         # Retrieve all products
-        return pd.read_sql_query("SELECT * FROM product", self.conn)
+        return self._cached_read(_read_frame, "SELECT * FROM product")
 
+    @traced_query
     def list_all_records(self):
         # Retrieve all records
-        return pd.read_sql_query(
+        return self._cached_read(
+            _read_frame,
             """
-        SELECT record.id, member.name AS member_name, product.name AS product_name, record.number 
-        FROM record 
-        JOIN member ON record.member_id = member.id 
-        JOIN product ON record.product_id = product.id
-        """,
-            self.conn,
+            SELECT record.id, member.name AS member_name, product.name AS product_name, record.number
+            FROM record
+            JOIN member ON record.member_id = member.id
+            JOIN product ON record.product_id = product.id
+            """,
         )
 
+    @traced_query
+    def member_product_totals(self, member_names=None):
+        # Retrieve the precomputed number of each product bought per member,
+        # optionally limited to the given member names
+        sql = """
+            SELECT member.name AS member_name, product.name AS product_name, totals.number
+            FROM member_product_totals AS totals
+            JOIN member ON totals.member_id = member.id
+            JOIN product ON totals.product_id = product.id
+            WHERE totals.number != 0
+            """
+        params = []
+        if member_names is not None:
+            sql += f" AND member.name IN ({', '.join('?' * len(member_names))})"
+            params = list(member_names)
+        return self._cached_read(_read_frame, sql, params)
+
+    @traced_query
+    def changes_since(self, watermarks=None):
+        # Return the member and product rows added after the given watermarks
+        # (the max ids seen by a previous call), the new watermarks and whether
+        # every row was reloaded. New rows are found with a rowid range scan.
+        # Updates and deletes cannot be seen that way, so everything is read
+        # again whenever another connection has committed since the last call:
+        # writes made through this DBManager are all inserts.
+        reloaded = not watermarks
+        watermarks = dict(watermarks or {})
+        data_version = self._foreign_data_version()
+        if not reloaded and watermarks.get("data") != data_version:
+            return self.changes_since()
+        queries = {
+            "member": "SELECT * FROM member WHERE id > ? ORDER BY id",
+            "product": "SELECT * FROM product WHERE id > ? ORDER BY id",
+        }
+        changes = {}
+        with self._reader() as conn:
+            for table, sql in queries.items():
+                since = watermarks.get(table, 0)
+                changes[table] = _read_frame(conn, sql, (since,))
+                if not changes[table].empty:
+                    watermarks[table] = int(changes[table]["id"].max())
+                else:
+                    watermarks[table] = since
+        watermarks["data"] = data_version
+        return changes, watermarks, reloaded
+
+    def _foreign_data_version(self):
+        # PRAGMA data_version on the writer connection only changes when another
+        # connection commits, never for the writer's own commits
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _query_conn(self):
+        # A read-only connection (mode=ro) that only the SELECT authorizer allows
+        # to read the queryable tables
+        if self.db_name == ":memory:":
+            raise ValueError("Read-only queries need a database file.")
+        conn = sqlite3.connect(
+            pathlib.Path(self.db_name).resolve().as_uri() + "?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        for pragma in ("busy_timeout", "mmap_size", "cache_size", "temp_store"):
+            if pragma in self._settings["pragmas"]:
+                conn.execute(f"PRAGMA {pragma} = {self._settings['pragmas'][pragma]}")
+        conn.execute("PRAGMA query_only = 1")
+        conn.set_authorizer(_authorize_read)
+        return conn
+
+    def _full_scans(self, conn, sql):
+        # member, product and record tables the query plan reads in full that
+        # hold more than FULL_SCAN_ROW_LIMIT rows (ids only grow, so MAX(id)
+        # bounds the count cheaply). member_product_totals is there to be
+        # aggregated, so scanning it is left to the timeout.
+        aliases = {
+            alias.lower(): table.lower()
+            for table, alias in TABLE_ALIAS_PATTERN.findall(sql)
+        }
+        scanned = set()
+        for *_, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+            # "SCAN record" or, before SQLite 3.36, "SCAN TABLE record"
+            match = re.match(r"SCAN (?:TABLE )?(\S+)", detail)
+            if match:
+                name = match.group(1).lower()
+                scanned.add(name if name in QUERYABLE_TABLES else aliases.get(name))
+        scanned &= {"member", "product", "record"}
+        if not scanned:
+            return []
+        with self._reader() as reader:
+            return sorted(
+                table
+                for table in scanned
+                if (reader.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0)
+                > FULL_SCAN_ROW_LIMIT
+            )
+
+    @traced_query
+    def read_query(self, sql, limit=MAX_PAGE_SIZE, timeout=QUERY_TIMEOUT):
+        # Run one SELECT written by the agent and return {"columns", "rows",
+        # "truncated"}, with at most limit rows. It runs on a read-only
+        # connection, plans scanning a large table in full are rejected and
+        # the query is interrupted after timeout seconds. Rejected queries
+        # raise ValueError; invalid SQL raises sqlite3.Error.
+        sql = sql.strip().rstrip(";").strip()
+        if not re.match(r"(SELECT|WITH)\b", sql, re.IGNORECASE):
+            raise ValueError("Only a single SELECT statement can be run.")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        # The outer LIMIT is enforced whatever the query says; one extra row
+        # tells whether the result was cut
+        wrapped = f"SELECT * FROM ({sql}) LIMIT {limit + 1}"
+
+        try:
+            conn = self._query_conns.get_nowait()
+        except queue.Empty:
+            conn = self._query_conn()
+        deadline = time.monotonic() + timeout
+        try:
+            with self._capture(conn):
+                scans = self._full_scans(conn, wrapped)
+                if scans:
+                    raise ValueError(
+                        f"The query reads every row of {', '.join(scans)}. Filter "
+                        "on an indexed column (id, name, record.member_id) or use "
+                        "member_product_totals for totals."
+                    )
+                # Checked every 1000 virtual machine instructions
+                conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+                try:
+                    cursor = conn.execute(wrapped)
+                    rows = cursor.fetchall()
+                except sqlite3.OperationalError as e:
+                    if time.monotonic() > deadline:
+                        raise ValueError(
+                            f"The query did not finish within {timeout:g}s."
+                        ) from e
+                    raise
+                finally:
+                    conn.set_progress_handler(None, 0)
+        finally:
+            self._query_conns.put(conn)
+        return {
+            "columns": [column[0] for column in cursor.description],
+            "rows": rows[:limit],
+            "truncated": len(rows) > limit,
+        }
+
     def close(self):
-        # Close the database connection
-        self.conn.close()
+        # Close the writer and every pooled reader connection
+        with self._lock:
+            self._flush()
+            if self._settings["optimize_on_close"]:
+                self.conn.execute("PRAGMA optimize")
+            if self._readers is not None:
+                while not self._readers.empty():
+                    self._readers.get_nowait().close()
+            while not self._query_conns.empty():
+                self._query_conns.get_nowait().close()
+            if self._watch_conn is not None:
+                self._watch_conn.close()
+            self.conn.close()
+
+
+# Process-wide DBManagers, one per database file
+_shared_managers = {}
+_shared_lock = threading.Lock()
+
+
+def get_db_manager(db_name="customer_database.db"):
+    """Return the DBManager shared by the whole process for a database file.
+
+    It is created on first use, with a small reader pool so concurrent
+    sessions, batch workers and API requests do not queue behind one
+    connection, and the schema check in create_tables runs only then. Its
+    result cache is shared by all of them as well.
+    """
+    with _shared_lock:
+        if db_name not in _shared_managers:
+            db_manager = DBManager(
+                db_name, pool_size=4, profile="production", result_cache_mb=64
+            )
+            db_manager.create_tables()
+            _shared_managers[db_name] = db_manager
+        return _shared_managers[db_name]
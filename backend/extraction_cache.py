@@ -0,0 +1,153 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.runnables import RunnableLambda
+
+from backend.tracing import annotate
+
+
+def model_identity(llm):
+    """Return a string identifying the provider class and model of an LLM."""
+    model = (
+        getattr(llm, "model_name", None)
+        or getattr(llm, "model", None)
+        or getattr(llm, "model_id", None)
+    )
+    return f"{type(llm).__name__}:{model}"
+
+
+def normalize_text(text):
+    """Collapse whitespace; case is kept because it shapes the extracted values."""
+    return " ".join(text.split())
+
+
+class ExtractionCache:
+    """LRU cache with TTL for structured-output extraction results.
+
+    Entries are keyed by normalized input text, schema class and model identity.
+    With db_path set, results are also written to a SQLite table so they survive
+    restarts and are shared between processes.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, db_path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._miss_seconds = 0.0
+
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(text, schema, model):
+        payload = json.dumps(
+            [normalize_text(text), f"{schema.__module__}.{schema.__qualname__}", model]
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key, schema):
+        # Look the key up in memory first, then in the persistent tier
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1].model_copy(deep=True)
+            self._entries.pop(key, None)
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM extraction_cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row and row[1] > now:
+                    result = schema.model_validate_json(row[0])
+                    self._remember(key, result, row[1])
+                    self.persistent_hits += 1
+                    return result.model_copy(deep=True)
+        return None
+
+    def set(self, key, result, elapsed=0.0):
+        # Store a fresh result; elapsed is the LLM latency it cost
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self.misses += 1
+            self._miss_seconds += elapsed
+            self._remember(key, result.model_copy(deep=True), expires_at)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO extraction_cache VALUES (?, ?, ?)",
+                    (key, result.model_dump_json(), expires_at),
+                )
+                self._conn.commit()
+
+    def _remember(self, key, result, expires_at):
+        self._entries[key] = (expires_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM extraction_cache")
+                self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the LLM time the hits are estimated to have saved."""
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            avg_miss = self._miss_seconds / self.misses if self.misses else 0.0
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "avg_llm_seconds": avg_miss,
+                "saved_llm_seconds": hits * avg_miss,
+            }
+
+    def wrap(self, chain, schema, model):
+        """Wrap an extraction chain taking {"text": ...} so results are cached."""
+
+        def invoke(inputs, config):
+            key = self.make_key(inputs["text"], schema, model)
+            result = self.get(key, schema)
+            annotate(cache_hit=result is not None)
+            if result is not None:
+                return result
+            start = time.perf_counter()
+            result = chain.invoke(inputs, config)
+            if isinstance(result, schema):
+                self.set(key, result, time.perf_counter() - start)
+            return result
+
+        return RunnableLambda(invoke, name=f"Cached{schema.__name__}Extraction")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
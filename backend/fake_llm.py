@@ -0,0 +1,236 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, List, Optional
+
+from pydantic import PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from backend.fast_extractor import AGE_PATTERN, EMAIL_PATTERN, QUANTITY_WORDS
+
+# The first rule matching the user's message picks the tool to call
+DEFAULT_TOOL_RULES = [
+    (r"\b(records?|history|what did)\b", "PurchaseRecordFetcher"),
+    (r"\b(buys?|bought|purchases?|orders?)\b", "Purchase"),
+    (r"\b(products|catalog(ue)?|in stock)\b", "ViewAllProducts"),
+    (r"\b(members|customers|users)\b", "ViewAllMembers"),
+    (r"\b(add|register|sign up|new member|email)\b", "ExtractAndWriteUserInfo"),
+]
+PERSON_PATTERN = re.compile(r"\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)\b")
+PRODUCT_PATTERN = re.compile(
+    r"\b(\d+|" + "|".join(QUANTITY_WORDS) + r")\s+([A-Za-z][\w-]*)", re.IGNORECASE
+)
+PRICE_PATTERN = re.compile(r"\$\s?(\d+(?:\.\d+)?)")
+NOT_PRODUCTS = {"year", "years", "yo", "of", "more", "other", "new"}
+
+
+def count_tokens(text):
+    # Rough count for English text, about four characters per token
+    return max(1, len(text) // 4)
+
+
+def extract_user(text):
+    """Rule-based UserInfo fields; values that are not found are None."""
+    name = PERSON_PATTERN.search(text)
+    email = EMAIL_PATTERN.search(text)
+    age = AGE_PATTERN.search(text)
+    return {
+        "name": name.group(1) if name else None,
+        "email": email.group(0) if email else None,
+        "age": int(age.group(1) or age.group(2)) if age else None,
+    }
+
+
+def extract_products(text):
+    """Rule-based ProductInfo fields for every "<quantity> <product>" in text."""
+    price = PRICE_PATTERN.search(text)
+    items = []
+    for quantity, word in PRODUCT_PATTERN.findall(text):
+        if word.lower() in NOT_PRODUCTS:
+            continue
+        if word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        number = (
+            int(quantity) if quantity.isdigit() else QUANTITY_WORDS[quantity.lower()]
+        )
+        items.append(
+            {"name": word, "price": price.group(1) if price else None, "number": number}
+        )
+    return items
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with tool calling, structured output and simulated latency.
+
+    Replies come from `responses` in order (strings or AIMessages, cycling) when
+    given. Otherwise they follow rules: the user's message picks a tool through
+    `tool_rules`, structured output is filled by regular expressions, and a
+    tool result is answered with a short summary. Each call waits a latency
+    drawn from a lognormal distribution around `latency` seconds plus the
+    output tokens at `tokens_per_second`, and reports approximate token usage.
+    """
+
+    model_name: str = "fake"
+    responses: Optional[List[Any]] = None
+    tool_rules: List[Any] = DEFAULT_TOOL_RULES
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    tokens_per_second: float = 0.0
+    seed: Optional[int] = 0
+
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _next_response: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self):
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name, "latency": self.latency}
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        if tool_choice is not None:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=formatted, **kwargs)
+
+    def _respond(self, messages, tools, tool_choice):
+        # Build the reply message, without usage or latency
+        if self.responses:
+            with self._lock:
+                response = self.responses[self._next_response % len(self.responses)]
+                self._next_response += 1
+            return (
+                AIMessage(content=response) if isinstance(response, str) else response
+            )
+
+        text = next(
+            (m.content for m in reversed(messages) if isinstance(m, HumanMessage)), ""
+        )
+        functions = {tool["function"]["name"]: tool["function"] for tool in tools}
+        if tool_choice is not None and len(functions) == 1:
+            # with_structured_output: answer with the schema filled from the text
+            name, function = next(iter(functions.items()))
+            return self._tool_call(name, self._fill(function["parameters"], text))
+
+        if messages and isinstance(messages[-1], ToolMessage):
+            return AIMessage(content=f"Here is the result:\n\n{messages[-1].content}")
+
+        for pattern, name in self.tool_rules:
+            if name in functions and re.search(pattern, text, re.IGNORECASE):
+                properties = functions[name]["parameters"].get("properties", {})
+                return self._tool_call(
+                    name, {"text": text} if "text" in properties else {}
+                )
+        return AIMessage(
+            content="I'm a fake model for offline testing, so I can only help with "
+            "members, products and purchases."
+        )
+
+    @staticmethod
+    def _tool_call(name, args):
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}
+            ],
+        )
+
+    @staticmethod
+    def _fill(parameters, text):
+        properties = parameters.get("properties", {})
+        if "items" in properties:
+            return {"member": extract_user(text), "items": extract_products(text)}
+        if "email" in properties:
+            return extract_user(text)
+        items = extract_products(text)
+        return items[0] if items else {}
+
+    def _usage(self, messages, tools, message):
+        input_tokens = sum(count_tokens(str(m.content)) for m in messages)
+        input_tokens += count_tokens(json.dumps(tools)) if tools else 0
+        output_tokens = count_tokens(message.content or json.dumps(message.tool_calls))
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def _first_token_delay(self):
+        if not self.latency:
+            return 0.0
+        with self._lock:
+            return self.latency * self._rng.lognormvariate(0, self.latency_jitter)
+
+    def _token_delay(self, tokens):
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tools = kwargs.get("tools", [])
+        message = self._respond(messages, tools, kwargs.get("tool_choice"))
+        usage = self._usage(messages, tools, message)
+        time.sleep(
+            self._first_token_delay() + self._token_delay(usage["output_tokens"])
+        )
+        message = message.model_copy(
+            update={
+                "usage_metadata": usage,
+                "response_metadata": {"model_name": self.model_name},
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        tools = kwargs.get("tools", [])
+        message = self._respond(messages, tools, kwargs.get("tool_choice"))
+        usage = self._usage(messages, tools, message)
+        time.sleep(self._first_token_delay())
+
+        if message.tool_calls:
+            chunks = [
+                AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": i,
+                        }
+                        for i, call in enumerate(message.tool_calls)
+                    ],
+                )
+            ]
+        else:
+            chunks = [
+                AIMessageChunk(content=word)
+                for word in re.findall(r"\S+\s*|\s+", message.content)
+            ]
+        for chunk in chunks:
+            time.sleep(self._token_delay(count_tokens(chunk.content or "    ")))
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata=usage,
+                response_metadata={"model_name": self.model_name},
+            )
+        )
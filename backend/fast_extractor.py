@@ -0,0 +1,265 @@
+import re
+import threading
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from backend.tracing import annotate
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+AGE_PATTERN = re.compile(
+    r"\b(\d{1,3})\s*(?:-\s*)?(?:years?[\s-]*old|y/?o)\b|\bage[d:]?\s*(?:is\s*)?(\d{1,3})\b",
+    re.IGNORECASE,
+)
+# "Ted Mosbi, 22 years old" or "Ted Mosbi (22)": a new member's name followed by their age
+NEW_MEMBER_PATTERN = re.compile(
+    r"([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)\s*[,(]\s*(?:aged?\s*)?\d{1,3}\b"
+)
+# A new member's name has at most this many words and does not start with a
+# word that usually opens the request instead: "Register Ted Mosbi, 22"
+MAX_NAME_WORDS = 3
+NOT_NAME_WORDS = {
+    "a",
+    "add",
+    "an",
+    "create",
+    "customer",
+    "enroll",
+    "hello",
+    "hi",
+    "insert",
+    "member",
+    "new",
+    "please",
+    "register",
+    "save",
+    "sign",
+    "store",
+    "the",
+    "user",
+    "welcome",
+}
+QUANTITY_WORDS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+}
+# Words that may follow a product name without starting another noun phrase
+TRAILING_WORDS = {"please", "today", "now", "for", "at", "in", "each", "total"}
+WORD_PATTERN = re.compile(r"[\w'-]+")
+
+
+class FastExtractor:
+    """Rule-based extraction that skips the LLM for rigidly phrased inputs.
+
+    Emails and ages are matched with regular expressions, and member and
+    product names against the names already stored through the DBManager. A
+    result is only returned when every field the tools need is filled without
+    ambiguity; otherwise the wrapped LLM chain runs as before.
+    """
+
+    def __init__(self, db_manager, refresh_interval=5.0):
+        # db_manager may also be a function returning one, called on first use
+        self._db_manager = db_manager
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._members = {}  # lowercased name -> stored name
+        self._products = {}
+        self._max_words = 1
+        self._loaded_at = None
+        self._loading = False
+        self.served = 0
+        self.fallbacks = 0
+
+    @property
+    def db_manager(self):
+        if callable(self._db_manager):
+            self._db_manager = self._db_manager()
+        return self._db_manager
+
+    def _names(self):
+        # Reload the name dictionaries at most every refresh_interval seconds.
+        # The reload reads every name, so it runs outside the lock: one caller
+        # reloads while the others keep using the previous dictionaries (until
+        # the first load, every caller loads them itself).
+        with self._lock:
+            now = time.monotonic()
+            names = self._members, self._products, self._max_words
+            if self._loaded_at is not None and (
+                self._loading or now - self._loaded_at <= self.refresh_interval
+            ):
+                return names
+            self._loading = True
+        try:
+            members = {
+                name.lower(): name for name in self.db_manager.list_member_names()
+            }
+            products = {
+                name.lower(): name for name in self.db_manager.list_product_names()
+            }
+            max_words = max(
+                [len(name.split()) for name in [*members, *products]], default=1
+            )
+        except BaseException:
+            with self._lock:
+                self._loading = False
+            raise
+        with self._lock:
+            self._members, self._products = members, products
+            self._max_words = max_words
+            self._loaded_at = now
+            self._loading = False
+        return members, products, max_words
+
+    @staticmethod
+    def _match(words, names, max_words, plural=False):
+        # Return (start, end, stored name) for every known name in the word list,
+        # preferring the longest match at each position
+        matches = []
+        i = 0
+        while i < len(words):
+            for size in range(min(max_words, len(words) - i), 0, -1):
+                phrase = " ".join(words[i : i + size]).lower()
+                candidates = [phrase]
+                if plural:
+                    candidates += (
+                        [phrase[:-1], phrase[:-2]] if phrase.endswith("s") else []
+                    )
+                found = next((names[c] for c in candidates if c in names), None)
+                if found:
+                    matches.append((i, i + size, found))
+                    i += size
+                    break
+            else:
+                i += 1
+        return matches
+
+    def extract_user(self, text):
+        """Return UserInfo fields as a dict, or None when the LLM is needed."""
+        members, _, max_words = self._names()
+        words = WORD_PATTERN.findall(text)
+        email = EMAIL_PATTERN.findall(text)
+        age = [int(a or b) for a, b in AGE_PATTERN.findall(text)]
+        if len(email) > 1 or len(age) > 1:
+            return None
+        user = {
+            "name": None,
+            "email": email[0] if email else None,
+            "age": age[0] if age else None,
+        }
+
+        matches = self._match(words, members, max_words)
+        known = {name for _, _, name in matches}
+        if len(known) == 1:
+            # Like a product, the name must end the phrase: "Bob Smith Jr" may
+            # be a new member whose name starts with a known one
+            if any(
+                end < len(words) and words[end][0].isupper() for _, end, _ in matches
+            ):
+                return None
+            user["name"] = known.pop()
+            # An email or age other than the stored one may mean a different
+            # person with the same name
+            if user["email"] is not None or user["age"] is not None:
+                stored = self.db_manager.get_member_by_name(user["name"])
+                if stored is None:
+                    return None
+                _, _, stored_email, stored_age = stored
+                if user["email"] is not None and user["email"].lower() != (
+                    (stored_email or "").lower()
+                ):
+                    return None
+                if user["age"] is not None and user["age"] != stored_age:
+                    return None
+            return user
+        if known:
+            return None
+
+        # A new member is only accepted when every field is present
+        new_member = NEW_MEMBER_PATTERN.findall(text)
+        if len(new_member) != 1 or not user["email"] or user["age"] is None:
+            return None
+        # The pattern takes every capitalised word before the age, which may
+        # include the words that open the request
+        name = new_member[0].split()
+        if len(name) > MAX_NAME_WORDS or name[0].lower() in NOT_NAME_WORDS:
+            return None
+        user["name"] = new_member[0]
+        return user
+
+    def extract_products(self, text):
+        """Return a list of ProductInfo fields as dicts, or None when the LLM is needed."""
+        _, products, max_words = self._names()
+        words = WORD_PATTERN.findall(text)
+        matches = self._match(words, products, max_words, plural=True)
+        if len(matches) != 1:
+            return None
+        start, end, name = matches[0]
+
+        # The product must end the phrase: "Laptop bag" or "Laptop and a mouse"
+        # may name something we do not know
+        if end < len(words) and words[end].lower() not in TRAILING_WORDS:
+            return None
+        if re.search(r"\b(and|plus|also)\b", " ".join(words[end:]).lower()):
+            return None
+
+        number = 1
+        if start > 0:
+            previous = words[start - 1].lower()
+            if previous.isdigit():
+                number = int(previous)
+            elif previous in QUANTITY_WORDS:
+                number = QUANTITY_WORDS[previous]
+            elif re.search(r"\d", " ".join(words[:start])):
+                # A quantity that is not next to the product name
+                return None
+        return [{"name": name, "number": number}]
+
+    def extract(self, text, schema):
+        """Fill schema (UserInfo, ProductInfo or PurchaseIntent) or return None."""
+        fields = schema.model_fields
+        if "items" in fields:
+            user = self.extract_user(text)
+            items = self.extract_products(text)
+            if user is None or items is None:
+                return None
+            return schema.model_validate({"member": user, "items": items})
+        if "email" in fields:
+            user = self.extract_user(text)
+            return None if user is None else schema.model_validate(user)
+        items = self.extract_products(text)
+        return None if items is None else schema.model_validate(items[0])
+
+    def wrap(self, chain, schema):
+        """Wrap an extraction chain taking {"text": ...} with the rule-based fast path."""
+
+        def invoke(inputs, config):
+            result = self.extract(inputs["text"], schema)
+            annotate(fast_path=result is not None)
+            with self._lock:
+                if result is None:
+                    self.fallbacks += 1
+                else:
+                    self.served += 1
+            return chain.invoke(inputs, config) if result is None else result
+
+        return RunnableLambda(invoke, name=f"FastPath{schema.__name__}Extraction")
+
+    def stats(self):
+        """Return how many extractions the fast path served without the LLM."""
+        with self._lock:
+            total = self.served + self.fallbacks
+            return {
+                "served": self.served,
+                "fallbacks": self.fallbacks,
+                "served_share": self.served / total if total else 0.0,
+            }
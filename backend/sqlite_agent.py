@@ -1,17 +1,24 @@
 # %%
-import re
-import boto3
-import streamlit as st
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
 from pydantic import BaseModel, Field
-from typing import Optional
-from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
-from langchain_community.chat_models import BedrockChat
+from typing import List, Optional
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+from langchain_core.tools import StructuredTool, ToolException
 from langgraph.prebuilt import create_react_agent
 
-from backend.db_manager import DBManager
+from backend.db_manager import MAX_PAGE_SIZE, PAGEABLE_COLUMNS, get_db_manager
+from backend.extraction_cache import ExtractionCache, model_identity
+from backend.fast_extractor import FastExtractor
+from backend.tool_sandbox import ToolSandbox, schema_from_json
+from backend.tracing import token_usage_handler, traced_runnable
 
 
 # %%
@@ -36,6 +43,31 @@ class ProductInfo(BaseModel):
     )
 
 
+# The purchase tool's single-call schema. It is sent with every purchase, so it
+# only carries the fields the tool uses, with short descriptions and without
+# the nullable wrappers around nested objects.
+class PurchaseMember(BaseModel):
+    """The buyer."""
+
+    name: Optional[str] = None
+    email: Optional[str] = None
+    age: Optional[int] = None
+
+
+class PurchaseItem(BaseModel):
+    """A product and how many to buy."""
+
+    name: Optional[str] = None
+    number: Optional[int] = 1
+
+
+class PurchaseIntent(BaseModel):
+    """A member and the products they want to purchase."""
+
+    member: PurchaseMember
+    items: List[PurchaseItem]
+
+
 # Create the extraction chain
 extraction_prompt = ChatPromptTemplate.from_messages(
     [
@@ -51,24 +83,98 @@ extraction_prompt = ChatPromptTemplate.from_messages(
 )
 
 
-def create_extraction_chain(llm):
-    member_extraction_chain = extraction_prompt | llm.with_structured_output(
-        schema=UserInfo
+# Extraction results shared by every session in the process
+extraction_cache = ExtractionCache()
+
+
+def supports_tool_calling(llm):
+    """Whether the model implements tool calling, which the nested PurchaseIntent schema needs."""
+    # Chat models without it inherit BaseChatModel.bind_tools, which raises
+    bind_tools = getattr(type(llm), "bind_tools", None)
+    return bind_tools is not None and bind_tools is not BaseChatModel.bind_tools
+
+
+def create_extraction_chain(llm, cache=extraction_cache, fast_path=True):
+    # fast_path may also be a FastExtractor reading the names of another database
+    model = model_identity(llm)
+    extractor = fast_path if isinstance(fast_path, FastExtractor) else fast_extractor
+
+    def structured(schema):
+        chain = extraction_prompt | llm.with_structured_output(schema=schema)
+        if cache is not None:
+            chain = cache.wrap(chain, schema, model)
+        if fast_path:
+            # Rigidly phrased inputs are parsed without calling the LLM
+            chain = extractor.wrap(chain, schema)
+        return traced_runnable(chain, f"extraction.{schema.__name__}")
+
+    member_extraction_chain = structured(UserInfo)
+    product_extraction_chain = structured(ProductInfo)
+    # Runs both extractions concurrently and returns {"member": ..., "product": ...}
+    purchase_extraction_chain = RunnableParallel(
+        member=member_extraction_chain, product=product_extraction_chain
     )
-    product_extraction_chain = extraction_prompt | llm.with_structured_output(
-        schema=ProductInfo
+
+    # Extracts a PurchaseIntent in a single structured-output call when the
+    # model supports tool calling, falling back to the two parallel chains when
+    # it fails to produce the nested schema at runtime.
+    parallel_intent_chain = purchase_extraction_chain | RunnableLambda(
+        lambda extracted: PurchaseIntent(
+            member=extracted["member"].model_dump(),
+            items=[extracted["product"].model_dump()],
+        )
     )
+    if supports_tool_calling(llm):
+        purchase_intent_chain = structured(PurchaseIntent).with_fallbacks(
+            [parallel_intent_chain]
+        )
+    else:
+        purchase_intent_chain = parallel_intent_chain
 
     return {
         "member_extraction_chain": member_extraction_chain,
         "product_extraction_chain": product_extraction_chain,
+        "purchase_extraction_chain": purchase_extraction_chain,
+        "purchase_intent_chain": purchase_intent_chain,
     }
 
 
 # %%
-# Initialize DBManager
-db_manager = DBManager("customer_database.db")
-db_manager.create_tables()
+# Nothing here touches the database on import: the tools are given a DBManager
+# when they are created, by default the process-wide one from get_db_manager,
+# and the fast path opens it on its first extraction.
+fast_extractor = FastExtractor(get_db_manager)
+# Custom tools from the Tool Developer page run in these worker processes
+tool_sandbox = ToolSandbox()
+
+# Minimum similarity for a fuzzy name match to stand in for an extracted name
+FUZZY_MATCH_THRESHOLD = 0.9
+
+
+def resolve_member(name, db_manager):
+    """Return the member row for an extracted name, tolerating case and small typos."""
+    member = db_manager.get_member_by_name(name)
+    if member:
+        return member
+    matches = db_manager.find_member(name, limit=1, min_score=FUZZY_MATCH_THRESHOLD)
+    return matches[0][0] if matches else None
+
+
+def resolve_exact(name, get_by_name, find, plural=False):
+    """Return (row, None) for an exact or case-insensitive match (plural=True also drops a plural ending), else (None, a close name to suggest or None)."""
+    row = get_by_name(name)
+    if row:
+        return row, None
+    names = {name.lower()}
+    if plural and name.lower().endswith("s"):
+        names |= {name.lower()[:-1], name.lower()[:-2]}
+    matches = find(name, limit=5, min_score=0)
+    for row, _ in matches:
+        if row[1].lower() in names:
+            return row, None
+    if matches and matches[0][1] >= FUZZY_MATCH_THRESHOLD:
+        return None, matches[0][0][1]
+    return None, None
 
 
 # %%
@@ -77,16 +183,16 @@ class ExtractAndWriteInput(BaseModel):
     text: str = Field(description="The text containing user information")
 
 
-def extract_and_write_user_info(text: str, extraction_chain) -> str:
+def extract_and_write_user_info(text: str, extraction_chain, db_manager) -> str:
     """Extract user information and write it to SQLite database."""
     user_info = extraction_chain["member_extraction_chain"].invoke({"text": text})
-    member = db_manager.get_member_by_name(user_info.name)
-    if member:
+    member, created = db_manager.get_or_create_member(
+        user_info.name, user_info.email, user_info.age
+    )
+    if not created:
         return f"Member {user_info.name} already exists with ID: {member[0]}"
     else:
-        db_manager.insert_member(user_info.name, user_info.email, user_info.age)
-        new_member = db_manager.get_member_by_name(user_info.name)
-        return f"Extracted and wrote user info: {new_member}"
+        return f"Extracted and wrote user info: {member}"
 
 
 # %%
@@ -95,23 +201,21 @@ class PurchaseRecordInput(BaseModel):
     text: str = Field(description="The text containing user information")
 
 
-def extract_and_get_purchase_record(text: str, extraction_chain) -> str:
+def extract_and_get_purchase_record(text: str, extraction_chain, db_manager) -> str:
     """Extract user information and return their purchase records from SQLite database."""
     user_info = extraction_chain["member_extraction_chain"].invoke({"text": text})
-    member = db_manager.get_member_by_name(user_info.name)
+    member = resolve_member(user_info.name, db_manager)
 
     if not member:
         return f"No member found for name '{user_info.name}'"
 
-    member_id = member[0]
+    member_id, member_name = member[0], member[1]
     purchase_records = db_manager.get_member_records(member_id)
 
     if not purchase_records:
-        return (
-            f"No purchase records found for member {user_info.name} (ID: {member_id})"
-        )
+        return f"No purchase records found for member {member_name} (ID: {member_id})"
 
-    response = f"Purchase records for {user_info.name} (ID: {member_id}):\n"
+    response = f"Purchase records for {member_name} (ID: {member_id}):\n"
     for record in purchase_records:
         response += f"- Record ID: {record[0]}, Product: {record[1]}, Price: {record[2]}, Number: {record[3]}, Payment: {record[2]*record[3]}\n"
 
@@ -124,66 +228,200 @@ class PurchaseInput(BaseModel):
     text: str = Field(description="The text containing user and purchase information")
 
 
-def extract_and_purchase(text: str, extraction_chain) -> str:
+def extract_and_purchase(text: str, extraction_chain, db_manager) -> str:
     """Extract user and purchase information, write it to SQLite database if necessary, and execute the purchase."""
 
-    user_info = extraction_chain["member_extraction_chain"].invoke({"text": text})
-    product_info = extraction_chain["product_extraction_chain"].invoke({"text": text})
+    intent = extraction_chain["purchase_intent_chain"].invoke({"text": text})
+    user_info = intent.member
 
-    if user_info.name is None:
+    if user_info is None or user_info.name is None:
         return "User information is incomplete."
-    if product_info.name is None:
+    if not intent.items or any(item.name is None for item in intent.items):
         return "Product information is incomplete."
 
-    member = db_manager.get_member_by_name(user_info.name)
+    # Resolve the member and every product before writing anything, so the
+    # writer lock is only held for the inserts. Unlike the read-only tools, a
+    # purchase is only written to an exact or case-insensitive match: a close
+    # name may be another person or product, so it is offered back instead.
+    member, suggestion = resolve_exact(
+        user_info.name, db_manager.get_member_by_name, db_manager.find_member
+    )
+    if suggestion:
+        return (
+            f"No member is named '{user_info.name}'. Did you mean "
+            f"'{suggestion}'? If '{user_info.name}' is a new member, add them first."
+        )
+    products = []
+    for product_info in intent.items:
+        product, suggestion = resolve_exact(
+            product_info.name,
+            db_manager.get_product_by_name,
+            db_manager.find_product,
+            plural=True,
+        )
+        if suggestion:
+            return (
+                f"No product is named '{product_info.name}'. "
+                f"Did you mean '{suggestion}'?"
+            )
+        if not product:
+            return f"Sorry, the product '{product_info.name}' does not exist."
+        products.append(product)
+
+    with db_manager.transaction():
+        if not member:
+            # If member doesn't exist, add new member
+            member, _ = db_manager.get_or_create_member(
+                user_info.name, user_info.email, user_info.age
+            )
+
+        member_id = member[0]
+
+        # Execute purchase
+        db_manager.insert_records_many(
+            [
+                (member_id, product[0], product_info.number)
+                for product, product_info in zip(products, intent.items)
+            ]
+        )
 
-    if not member:
-        # If member doesn't exist, add new member
-        db_manager.insert_member(user_info.name, user_info.email, user_info.age)
-        member = db_manager.get_member_by_name(user_info.name)
+    bought = ", ".join(
+        f"{product_info.number} {product[1]}(s)"
+        for product, product_info in zip(products, intent.items)
+    )
+    return f"Purchase successful! Member {member[1]} bought {bought}."
 
-    member_id = member[0]
 
-    # Execute purchase
-    product = db_manager.get_product_by_name(product_info.name)
-    if not product:
-        return f"Sorry, the product '{product_info.name}' does not exist."
+# %%
+# Paging arguments shared by the ViewAllProducts and ViewAllMembers tools
+class PageInput(BaseModel):
+    limit: int = Field(
+        default=20,
+        description=f"Maximum number of rows to return (at most {MAX_PAGE_SIZE})",
+    )
+    offset: int = Field(default=0, description="Number of matching rows to skip")
+    cursor: Optional[int] = Field(
+        default=None,
+        description="The next cursor returned by a previous call, to fetch the following page",
+    )
+    name_prefix: Optional[str] = Field(
+        default=None, description="Only return rows whose name starts with this text"
+    )
 
-    product_id = product[0]
-    db_manager.insert_record(member_id, product_id, product_info.number)
 
-    return f"Purchase successful! Member {user_info.name} bought {product_info.number} {product_info.name}(s)."
+def format_page(label, page, offset=0, cursor=None):
+    """Render a page from DBManager.page_rows as a compact text table."""
+    if not page["rows"]:
+        return f"No {label} found (total matching: {page['total']})."
 
+    position = (
+        "" if cursor is not None else f" {offset + 1}-{offset + len(page['rows'])}"
+    )
+    lines = [
+        f"Showing {len(page['rows'])}{position} of {page['total']} {label}.",
+        " | ".join(page["columns"]),
+    ]
+    lines += [" | ".join(str(value) for value in row) for row in page["rows"]]
+    if page["next_cursor"] is not None:
+        lines.append(
+            f"More rows available: call again with cursor={page['next_cursor']}."
+        )
+    return "\n".join(lines)
 
-# %%
-class ViewAllProductsInput(BaseModel):
-    pass  # No input required for viewing all products
+
+class ViewAllProductsInput(PageInput):
+    columns: Optional[List[str]] = Field(
+        default=None,
+        description=f"Columns to return, any of {PAGEABLE_COLUMNS['product']} (default: all)",
+    )
 
 
-def view_all_products() -> str:
-    """Return all products from the SQLite database."""
-    products = db_manager.list_all_products()
+def view_all_products(
+    db_manager, limit=20, offset=0, cursor=None, name_prefix=None, columns=None
+) -> str:
+    """Return one page of products from the SQLite database."""
+    try:
+        products = db_manager.page_rows(
+            "product", limit, offset, cursor, name_prefix, columns
+        )
+    except ValueError as e:
+        return str(e)
 
-    return products
+    return format_page("products", products, offset, cursor)
 
 
 # %%
-class ViewAllMembersInput(BaseModel):
-    pass  # No input required for viewing all members
+class ViewAllMembersInput(PageInput):
+    columns: Optional[List[str]] = Field(
+        default=None,
+        description=f"Columns to return, any of {PAGEABLE_COLUMNS['member']} (default: all)",
+    )
+
+
+def view_all_members(
+    db_manager, limit=20, offset=0, cursor=None, name_prefix=None, columns=None
+) -> str:
+    """Return one page of members from the SQLite database."""
+    try:
+        members = db_manager.page_rows(
+            "member", limit, offset, cursor, name_prefix, columns
+        )
+    except ValueError as e:
+        return str(e)
 
+    return format_page("members", members, offset, cursor)
 
-def view_all_members() -> str:
-    """Return all members from the SQLite database."""
-    members = db_manager.list_all_members()
 
-    return members
+# %%
+# Define the tool for answering questions with one read-only SELECT
+QUERY_SCHEMA = """member(id INTEGER PRIMARY KEY, name TEXT UNIQUE, email TEXT, age INTEGER)
+product(id INTEGER PRIMARY KEY, name TEXT, price REAL)
+record(id INTEGER PRIMARY KEY, member_id INTEGER REFERENCES member(id), product_id INTEGER REFERENCES product(id), number INTEGER) -- one row per purchase
+member_product_totals(member_id INTEGER, product_id INTEGER, number INTEGER, PRIMARY KEY (member_id, product_id)) -- total number of each product bought by each member
+Indexes: member(name), product(name), record(member_id, id, product_id, number)"""
+
+
+class QueryDatabaseInput(BaseModel):
+    sql: str = Field(description="One SQLite SELECT statement")
+    limit: int = Field(
+        default=20,
+        description=f"Maximum number of rows to return (at most {MAX_PAGE_SIZE})",
+    )
+
+
+def query_database(db_manager, sql, limit=20) -> str:
+    """Run one read-only SELECT and return its rows as a text table."""
+    try:
+        result = db_manager.read_query(sql, limit)
+    except ValueError as e:
+        return str(e)
+    except sqlite3.Error as e:
+        return f"The query failed: {e}"
+
+    if not result["rows"]:
+        return "The query returned no rows."
+    lines = [" | ".join(result["columns"])]
+    lines += [" | ".join(str(value) for value in row) for row in result["rows"]]
+    if result["truncated"]:
+        lines.append(
+            f"Only the first {len(result['rows'])} rows are shown; aggregate or "
+            "filter in SQL to see the rest."
+        )
+    return "\n".join(lines)
 
 
 # %%
 # Create tools with current descriptions
-def create_default_tools(extraction_chain):
+def create_default_tools(extraction_chain, db_manager=None):
+    # The tools read and write through db_manager, the process-wide DBManager
+    # unless another one is given
+    if db_manager is None:
+        db_manager = get_db_manager()
+
     extract_and_write_tool = StructuredTool.from_function(
-        func=lambda text: extract_and_write_user_info(text, extraction_chain),
+        func=lambda text: extract_and_write_user_info(
+            text, extraction_chain, db_manager
+        ),
         name="ExtractAndWriteUserInfo",
         description="Extract user information from text and write it to SQLite database",
         args_schema=ExtractAndWriteInput,
@@ -191,44 +429,61 @@ def create_default_tools(extraction_chain):
     )
 
     view_all_members_tool = StructuredTool.from_function(
-        func=view_all_members,
+        func=functools.partial(view_all_members, db_manager),
         name="ViewAllMembers",
-        description="View all products in database to answer the user if user asks about members' information",
+        description="View members in database, one page at a time, to answer the user if user asks about members' information. Filter by name_prefix and pick columns to keep the result small.",
         args_schema=ViewAllMembersInput,
         return_direct=True,
     )
 
     view_all_products_tool = StructuredTool.from_function(
-        func=view_all_products,
+        func=functools.partial(view_all_products, db_manager),
         name="ViewAllProducts",
-        description="View all products in database if user asks about products' information",
+        description="View products in database, one page at a time, if user asks about products' information. Filter by name_prefix and pick columns to keep the result small.",
         args_schema=ViewAllProductsInput,
         return_direct=True,
     )
 
     purchase_tool = StructuredTool.from_function(
-        func=lambda text: extract_and_purchase(text, extraction_chain),
+        func=lambda text: extract_and_purchase(text, extraction_chain, db_manager),
         name="Purchase",
         description="Call this tool when the user wants to purchase an item. The tool will handle extracting product information from the input and completing the purchase process.",
         args_schema=PurchaseInput,
         return_direct=True,
     )
 
+    query_database_tool = StructuredTool.from_function(
+        func=functools.partial(query_database, db_manager),
+        name="QueryDatabase",
+        description="Answer questions about members, products and purchases, such as a member's age or the best-selling product, "
+        "with one read-only SQLite SELECT. Let the query do the filtering, joining and aggregation and return only the rows needed. "
+        "Queries that scan a whole large table are rejected, so filter on indexed columns and use member_product_totals for purchase totals. "
+        f"Schema:\n{QUERY_SCHEMA}",
+        args_schema=QueryDatabaseInput,
+    )
+
     purchase_record_tool = StructuredTool.from_function(
-        func=lambda text: extract_and_get_purchase_record(text, extraction_chain),
+        func=lambda text: extract_and_get_purchase_record(
+            text, extraction_chain, db_manager
+        ),
         name="PurchaseRecordFetcher",
         description="Extract user information from text and fetch purchase records from SQLite database",
         args_schema=PurchaseRecordInput,
         return_direct=True,
     )
 
-    return [
+    tools = [
         extract_and_write_tool,
         purchase_record_tool,
         purchase_tool,
         view_all_members_tool,
         view_all_products_tool,
+        query_database_tool,
     ]
+    # Part of tool_signature, so agents on different databases never share a graph
+    for tool in tools:
+        tool.metadata = {"database": db_manager.db_name}
+    return tools
 
 
 # %%
@@ -242,207 +497,201 @@ Remember to:
 - Always maintain a positive and friendly tone.
 - Be patient with users and ensure they feel supported throughout their interaction.
 - Provide helpful explanations after using the tools, summarizing the outcome or offering next steps.
+- Answer questions about the data, such as counts, totals or a single member's details, with the QueryDatabase tool rather than by listing whole tables.
 - Avoid technical jargon unless the user seems to expect or request it.
 """
 
 
 # %%
+# LLM clients and compiled agent graphs shared by every session in the process
+_llm_cache = {}
+_agent_cache = OrderedDict()
+AGENT_CACHE_SIZE = 32
+_cache_lock = threading.Lock()
+
+
+# Provider name -> function building its chat model from the model arguments.
+# Each provider's client library is imported when the provider is first used,
+# so importing this module does not load all of them.
+LLM_PROVIDERS = {}
+
+
+def llm_provider(name):
+    def register(factory):
+        LLM_PROVIDERS[name] = factory
+        return factory
+
+    return register
+
+
+@llm_provider("OpenAI")
+def _openai_llm(model_args):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        api_key=model_args["api_key"],
+        model=model_args["model_name"],
+        max_tokens=None,
+        timeout=None,
+    )
+
+
+@llm_provider("Ollama")
+def _ollama_llm(model_args):
+    from langchain_ollama import ChatOllama
+
+    return ChatOllama(
+        model=model_args["model_name"],
+        temperature=0,
+    )
+
+
+@llm_provider("Bedrock")
+def _bedrock_llm(model_args):
+    import boto3
+    from langchain_community.chat_models import BedrockChat
+
+    boto3_config = {
+        "region_name": model_args["aws_region"],
+        "aws_access_key_id": model_args["aws_access_key"],
+        "aws_secret_access_key": model_args["aws_secret_key"],
+    }
+    return BedrockChat(
+        client=boto3.client("bedrock-runtime", **boto3_config),
+        provider="anthropic",
+        model_id=model_args["model_name"],
+    )
+
+
+@llm_provider("Fake")
+def _fake_llm(model_args):
+    from backend.fake_llm import FakeChatModel
+
+    return FakeChatModel(
+        model_name=model_args.get("model_name", "fake"),
+        latency=model_args.get("latency", 0.0),
+        latency_jitter=model_args.get("latency_jitter", 0.0),
+        tokens_per_second=model_args.get("tokens_per_second", 0.0),
+    )
+
+
 def create_llm(provider: str, model_args: dict):
-    if provider == "OpenAI":
-        llm = ChatOpenAI(
-            api_key=model_args["api_key"],
-            model=model_args["model_name"],
-            max_tokens=None,
-            timeout=None,
-        )
-    elif provider == "Ollama":
-        llm = ChatOllama(
-            model=model_args["model_name"],
-            temperature=0,
-        )
-    elif provider == "Bedrock":
-        boto3_config = {
-            "region_name": model_args["aws_region"],
-            "aws_access_key_id": model_args["aws_access_key"],
-            "aws_secret_access_key": model_args["aws_secret_key"],
-        }
-        llm = BedrockChat(
-            client=boto3.client("bedrock-runtime", **boto3_config),
-            provider="anthropic",
-            model_id=model_args["model_name"],
+    # Sessions with the same provider and model arguments share one client
+    key = (
+        provider,
+        hashlib.sha256(json.dumps(model_args, sort_keys=True).encode()).hexdigest(),
+    )
+    with _cache_lock:
+        if key in _llm_cache:
+            return _llm_cache[key]
+
+    if provider not in LLM_PROVIDERS:
+        raise ValueError(
+            f"Unknown provider '{provider}', expected one of {list(LLM_PROVIDERS)}"
         )
+    llm = LLM_PROVIDERS[provider](model_args)
+
+    # Token usage of each call is recorded in the trace of the request making it
+    llm.callbacks = [token_usage_handler()]
+    with _cache_lock:
+        return _llm_cache.setdefault(key, llm)
+
+
+@functools.lru_cache(maxsize=256)
+def _schema_json(args_schema):
+    # Generating a JSON schema is the slow part of hashing a tool, and the
+    # input schemas are shared classes
+    return json.dumps(args_schema.model_json_schema(), sort_keys=True)
+
+
+def tool_signature(tools):
+    """Hash the tool names, descriptions, schemas and metadata an agent is built from."""
+    payload = [
+        [
+            tool.name,
+            tool.description,
+            (
+                _schema_json(tool.args_schema)
+                if isinstance(tool.args_schema, type)
+                else tool.args
+            ),
+            tool.return_direct,
+            tool.metadata,
+        ]
+        for tool in tools
+    ]
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def build_agent(llm, tools):
+    """Return a compiled ReAct agent, reusing the graph of an identical configuration.
 
-    return llm
+    Graphs are keyed by the LLM client (create_llm hands out one per provider
+    and model arguments, and a cached graph keeps its client alive) and by
+    tool_signature, so sessions with the same setup share one compiled graph.
+    """
+    key = (model_identity(llm), id(llm), tool_signature(tools))
+    with _cache_lock:
+        if key in _agent_cache:
+            _agent_cache.move_to_end(key)
+            return _agent_cache[key]
+
+    agent = create_react_agent(llm, tools, state_modifier=system_prompt)
+
+    with _cache_lock:
+        agent = _agent_cache.setdefault(key, agent)
+        _agent_cache.move_to_end(key)
+        while len(_agent_cache) > AGENT_CACHE_SIZE:
+            _agent_cache.popitem(last=False)
+    return agent
 
 
 # Recreate agent
 def recreate_agent(new_tool: StructuredTool = None):
-    tools = st.session_state.tools
-    for tool in tools:
-        if tool.name in st.session_state.tool_descriptions:
-            tool.description = st.session_state.tool_descriptions[tool.name]
+    # Only the Streamlit pages call this, so other processes never import it
+    import streamlit as st
 
     if new_tool:
         st.session_state.tool_descriptions[new_tool.name] = new_tool.description
         st.session_state.tools.append(new_tool)
 
-    return create_react_agent(
-        st.session_state.llm, st.session_state.tools, state_modifier=system_prompt
-    )
+    # Apply edited descriptions to copies so tool objects are never mutated
+    descriptions = st.session_state.tool_descriptions
+    st.session_state.tools = [
+        (
+            tool.model_copy(update={"description": descriptions[tool.name]})
+            if descriptions.get(tool.name, tool.description) != tool.description
+            else tool
+        )
+        for tool in st.session_state.tools
+    ]
 
+    return build_agent(st.session_state.llm, st.session_state.tools)
 
-def create_tool_from_code(code: str) -> StructuredTool:
-    db_manager_code = """import sqlite3
-import pandas as pd
-
-class DBManager:
-    def __init__(self, db_name='customer_database.db'):
-        # Connect to the database
-        self.db_name = db_name
-        self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-
-    def create_tables(self):
-        # Create 'member', 'product', and 'record' tables
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS member (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL,
-            age INTEGER NOT NULL
-        )
-        ''')
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS product (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            price REAL NOT NULL
-        )
-        ''')
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS record (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            member_id INTEGER,
-            product_id INTEGER,
-            number INTEGER,
-            FOREIGN KEY (member_id) REFERENCES member(id),
-            FOREIGN KEY (product_id) REFERENCES product(id)
-        )
-        ''')
-        self.conn.commit()
-        # Check if member table is empty
-        self.cursor.execute('SELECT COUNT(*) FROM member')
-        if self.cursor.fetchone()[0] == 0:
-            self.insert_example_data()
-
-    def insert_example_data(self):
-        # Insert some example members
-        members = [
-            ('Alice Johnson', 'alice@example.com', 25),
-            ('Bob Smith', 'bob@example.com', 30),
-            ('Charlie Brown', 'charlie@example.com', 22)
-        ]
-        self.cursor.executemany("INSERT INTO member (name, email, age) VALUES (?, ?, ?)", members)
-        
-        # Insert some example products
-        products = [
-            ('Laptop', 999.99),
-            ('Smartphone', 499.99),
-            ('Headphones', 199.99)
-        ]
-        self.cursor.executemany("INSERT INTO product (name, price) VALUES (?, ?)", products)
 
-        # Insert some example records
-        records = [
-            (1, 1, 1),  # Alice buys 1 Laptop
-            (2, 2, 2),  # Bob buys 2 Smartphones
-            (3, 3, 3)   # Charlie buys 3 Headphones
-        ]
-        self.cursor.executemany("INSERT INTO record (member_id, product_id, number) VALUES (?, ?, ?)", records)
-        
-        self.conn.commit()
-
-    def insert_member(self, name, email, age):
-        # Insert a new member
-        self.cursor.execute("INSERT INTO member (name, email, age) VALUES (?, ?, ?)", (name, email, age))
-        self.conn.commit()
-
-    def insert_product(self, name, price):
-        # Insert a new product
-        self.cursor.execute("INSERT INTO product (name, price) VALUES (?, ?)", (name, price))
-        self.conn.commit()
-
-    def insert_record(self, member_id, product_id, number):
-        # Insert a new purchase record
-        self.cursor.execute("INSERT INTO record (member_id, product_id, number) VALUES (?, ?, ?)", (member_id, product_id, number))
-        self.conn.commit()
-
-    def get_member_by_name(self, name):
-        # Find a member by name
-        self.cursor.execute("SELECT * FROM member WHERE name = ?", (name,))
-        return self.cursor.fetchone()
-
-    def get_product_by_name(self, product_name):
-        # Find a product by name
-        self.cursor.execute("SELECT * FROM product WHERE name = ?", (product_name,))
-        return self.cursor.fetchone()
-
-    def get_member_records(self, member_id):
-        # Retrieve all records for a specific member
-        self.cursor.execute('''
-        SELECT record.id, product.name, product.price, record.number, product.price*record.number
-        FROM record 
-        JOIN product ON record.product_id = product.id
-        WHERE record.member_id = ?
-        ''', (member_id,))
-        return self.cursor.fetchall()
-    
-    def list_all_members(self):
-        # Retrieve all members
-        return pd.read_sql_query("SELECT * FROM member", self.conn)
-    
-    def list_all_products(self):
-        # Retrieve all products
-        return pd.read_sql_query("SELECT * FROM product", self.conn)
-    
-    def list_all_records(self):
-        # Retrieve all records
-        return pd.read_sql_query('''
-        SELECT record.id, member.name AS member_name, product.name AS product_name, record.number 
-        FROM record 
-        JOIN member ON record.member_id = member.id 
-        JOIN product ON record.product_id = product.id
-        ''', self.conn)
-
-    def close(self):
-        # Close the database connection
-        self.conn.close()\n\n"""
-    new_tool_code = re.search(
-        r"(new_tool\s*=\s*StructuredTool\.from_function\(.+?\))", code, re.DOTALL
-    ).group(1)
-
-    func_name = re.search(r"func=(\w+)", new_tool_code).group(1)
-    schema_name = re.search(r"args_schema=(\w+)", new_tool_code).group(1)
-    tool_name = re.search(r"name='(.+?)'", new_tool_code).group(1)
-    description = re.search(r"description='(.+?)'", new_tool_code).group(1)
-
-    code = db_manager_code + code
-
-    exec(code, globals())
-
-    if func_name in globals() and schema_name in globals():
-        new_tool = StructuredTool.from_function(
-            func=globals()[func_name],
-            name=tool_name,
-            description=description,
-            args_schema=globals()[schema_name],
-            return_direct=True,
-        )
-        return new_tool
-    else:
-        raise ValueError(
-            f"Provided function {func_name} or schema {schema_name} not found in the code."
-        )
+def create_tool_from_code(code: str) -> StructuredTool:
+    """Build a tool whose code runs in the sandbox worker pool, not this process."""
+    try:
+        code_hash = tool_sandbox.compile(code)
+        spec = tool_sandbox.describe(code_hash)
+    except (SyntaxError, ToolException) as e:
+        raise ValueError(f"Could not load the tool code: {e}") from e
+
+    return StructuredTool.from_function(
+        func=functools.partial(tool_sandbox.call, code_hash),
+        name=spec["name"],
+        description=spec["description"],
+        args_schema=schema_from_json(
+            spec["schema"].get("title", "CustomToolInput"), spec["schema"]
+        ),
+        return_direct=spec["return_direct"],
+        # Timeouts and errors inside the tool are reported back to the agent
+        handle_tool_error=True,
+        # Distinguishes tools whose names and schemas match but code differs
+        metadata={"code_sha256": code_hash},
+    )
 
 
 # %%
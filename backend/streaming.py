@@ -0,0 +1,92 @@
+"""Token-level streaming of agent turns.
+
+The installed LangGraph (0.2.21) only streams whole graph steps, so the agent
+model's tokens are taken from a callback handler instead. Subclassing
+langchain-core's streaming handler mixin makes chat models stream inside
+``invoke`` (the same mechanism LangGraph's "messages" stream mode relies on),
+and the graph runs on a worker thread so tokens reach the caller while the
+model is still producing them.
+"""
+
+import contextvars
+import queue
+import threading
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers._streaming import _StreamingCallbackHandler
+
+
+class TokenStreamHandler(BaseCallbackHandler, _StreamingCallbackHandler):
+    """Put the tokens of the agent node's model calls on a queue.
+
+    Model calls made elsewhere in the graph, such as the extraction chains
+    inside tools, are ignored.
+    """
+
+    def __init__(self, events, node="agent"):
+        self.events = events
+        self.node = node
+        self._runs = set()
+        self._streamed = set()
+
+    def tap_output_iter(self, run_id, output):
+        return output
+
+    def tap_output_aiter(self, run_id, output):
+        return output
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if (kwargs.get("metadata") or {}).get("langgraph_node") == self.node:
+            self._runs.add(run_id)
+
+    def on_llm_new_token(self, token, *, chunk=None, run_id, **kwargs):
+        if run_id in self._runs and token:
+            self._streamed.add(run_id)
+            self.events.put(("token", token))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        # A model that does not stream still shows its answer, all at once
+        if run_id in self._runs and run_id not in self._streamed:
+            for generations in response.generations:
+                for generation in generations:
+                    if generation.text:
+                        self.events.put(("token", generation.text))
+        self._runs.discard(run_id)
+        self._streamed.discard(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.discard(run_id)
+        self._streamed.discard(run_id)
+
+
+def stream_agent(agent, inputs, config=None):
+    """Run one agent turn, yielding ("token", text) and ("step", update) events.
+
+    Tokens of the agent's reply arrive as the model produces them; a step
+    event carries each graph update, e.g. {"tools": {"messages": [...]}}, as
+    soon as the node finishes. Exceptions from the graph are re-raised.
+    """
+    events = queue.Queue()
+    config = dict(config or {})
+    config["callbacks"] = list(config.get("callbacks") or []) + [
+        TokenStreamHandler(events)
+    ]
+
+    def run():
+        try:
+            for step in agent.stream(inputs, config, stream_mode="updates"):
+                events.put(("step", step))
+        except Exception as e:
+            events.put(("error", e))
+        finally:
+            events.put(None)
+
+    # Copy the context so spans opened by the graph nest under the caller's
+    thread = threading.Thread(
+        target=contextvars.copy_context().run, args=(run,), daemon=True
+    )
+    thread.start()
+    while (event := events.get()) is not None:
+        if event[0] == "error":
+            raise event[1]
+        yield event
@@ -0,0 +1,245 @@
+import atexit
+import hashlib
+import marshal
+import multiprocessing
+import queue
+import threading
+import traceback
+from collections import OrderedDict
+from typing import List, Optional
+
+from pydantic import Field, create_model
+from langchain_core.tools import ToolException
+
+try:
+    import resource
+except ImportError:  # Windows: no address space limits
+    resource = None
+
+JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+# %%
+# Worker side: runs in a separate process with DBManager and langchain preloaded
+def _preload():
+    # Names custom tool code could use from the agent module's globals before
+    from pydantic import BaseModel, Field
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.tools import StructuredTool
+
+    from backend.db_manager import DBManager
+
+    return {
+        "BaseModel": BaseModel,
+        "Field": Field,
+        "List": List,
+        "Optional": Optional,
+        "ChatPromptTemplate": ChatPromptTemplate,
+        "StructuredTool": StructuredTool,
+        "DBManager": DBManager,
+    }
+
+
+def _limit_memory(memory_mb):
+    # Cap the address space on top of what the preloaded modules already use
+    if resource is None or not memory_mb:
+        return
+    try:
+        with open("/proc/self/statm") as f:
+            used = int(f.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        used = 0
+    limit = used + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _load_tool(tools, preloaded, code_hash, bytecode):
+    # Execute the tool code once per worker and keep the resulting tool by hash
+    if code_hash in tools:
+        tools.move_to_end(code_hash)
+        return tools[code_hash]
+    namespace = {"__name__": f"custom_tool_{code_hash[:12]}", **preloaded}
+    exec(marshal.loads(bytecode), namespace)
+    tool = namespace.get("new_tool")
+    if tool is None or not hasattr(tool, "args_schema"):
+        raise ValueError(
+            "The code must define new_tool with StructuredTool.from_function."
+        )
+    tools[code_hash] = tool
+    while len(tools) > 64:
+        tools.popitem(last=False)
+    return tool
+
+
+def _worker_main(conn, memory_mb, max_result_chars):
+    preloaded = _preload()
+    _limit_memory(memory_mb)
+    tools = OrderedDict()
+    conn.send(("ready", None))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        action, code_hash, bytecode, kwargs = request
+        try:
+            tool = _load_tool(tools, preloaded, code_hash, bytecode)
+            if action == "load":
+                result = {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "return_direct": tool.return_direct,
+                    "schema": tool.args_schema.model_json_schema(),
+                }
+            else:
+                result = tool.func(**kwargs)
+                result = result if isinstance(result, str) else str(result)
+                if len(result) > max_result_chars:
+                    result = (
+                        result[:max_result_chars]
+                        + f"\n... [truncated {len(result) - max_result_chars} characters]"
+                    )
+            conn.send(("ok", result))
+        except MemoryError:
+            conn.send(("error", "The tool ran out of memory."))
+        except Exception as e:
+            detail = traceback.format_exception_only(type(e), e)[-1].strip()
+            conn.send(("error", detail))
+
+
+# %%
+# Parent side
+class _Worker:
+    def __init__(self, context, memory_mb, max_result_chars):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_mb, max_result_chars),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self):
+        # Imports in a fresh worker do not count against a call's timeout
+        if not self.ready:
+            self.conn.recv()
+            self.ready = True
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def schema_from_json(name, schema):
+    """Rebuild a flat pydantic model from the JSON schema of a tool's args_schema."""
+    required = set(schema.get("required", []))
+    fields = {}
+    for field_name, prop in schema.get("properties", {}).items():
+        types = [option.get("type") for option in prop.get("anyOf", [prop])]
+        annotation = next((JSON_TYPES[t] for t in types if t in JSON_TYPES), str)
+        if "null" in types:
+            annotation = Optional[annotation]
+        default = ... if field_name in required else prop.get("default")
+        fields[field_name] = (
+            annotation,
+            Field(default=default, description=prop.get("description")),
+        )
+    model = create_model(name, **fields)
+    model.__doc__ = schema.get("description")
+    return model
+
+
+class ToolSandbox:
+    """Pool of warm worker processes that run custom tool code.
+
+    Workers import DBManager and langchain once and keep executed tool code by
+    its sha256, so the agent process only ever sends arguments and receives a
+    string. A call that exceeds timeout seconds kills its worker, which is
+    replaced straight away; memory_mb caps each worker's address space above
+    what the preloaded modules use and results are cut at max_result_chars.
+    """
+
+    def __init__(self, workers=2, timeout=30.0, memory_mb=512, max_result_chars=20000):
+        self.size = workers
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_result_chars = max_result_chars
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._compiled = {}  # sha256 -> marshalled code object
+
+    def start(self):
+        # Spawn the workers; they finish importing in the background
+        with self._lock:
+            if not self._started:
+                for _ in range(self.size):
+                    self._idle.put(self._spawn())
+                self._started = True
+                atexit.register(self.close)
+
+    def _spawn(self):
+        return _Worker(self._context, self.memory_mb, self.max_result_chars)
+
+    def compile(self, code):
+        """Compile tool code once; return its sha256, which later calls refer to."""
+        code_hash = hashlib.sha256(code.encode()).hexdigest()
+        with self._lock:
+            if code_hash not in self._compiled:
+                code_object = compile(code, f"<custom tool {code_hash[:12]}>", "exec")
+                self._compiled[code_hash] = marshal.dumps(code_object)
+        return code_hash
+
+    def _request(self, action, code_hash, kwargs=None):
+        self.start()
+        worker = self._idle.get()
+        try:
+            worker.wait_ready()
+            worker.conn.send((action, code_hash, self._compiled[code_hash], kwargs))
+            if not worker.conn.poll(self.timeout):
+                raise TimeoutError
+            status, result = worker.conn.recv()
+        except TimeoutError:
+            worker.kill()
+            worker = self._spawn()
+            raise ToolException(f"The tool did not finish within {self.timeout:g}s.")
+        except (EOFError, OSError):
+            # The worker died, e.g. it was killed for exceeding its memory limit
+            worker.kill()
+            worker = self._spawn()
+            raise ToolException("The tool process exited unexpectedly.")
+        finally:
+            self._idle.put(worker)
+        if status == "error":
+            raise ToolException(result)
+        return result
+
+    def describe(self, code_hash):
+        """Return the name, description and args JSON schema of compiled tool code."""
+        return self._request("load", code_hash)
+
+    def call(self, code_hash, **kwargs):
+        return self._request("call", code_hash, kwargs)
+
+    def close(self):
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+        # Workers still busy are daemonic and go down with this process
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
@@ -0,0 +1,229 @@
+import contextvars
+import functools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span():
+    """Return the innermost open span of this context, or None outside a trace."""
+    return _current_span.get()
+
+
+def annotate(**attributes):
+    """Add attributes to the innermost open span, if there is one."""
+    span = _current_span.get()
+    if span is not None:
+        span["attributes"].update(attributes)
+
+
+class Tracer:
+    """Collects timed spans for agent requests in memory.
+
+    A span opened outside any other span starts a new trace; spans opened
+    inside it, in the same thread or in threads that copy the context as
+    LangChain's executors do, become its children. Only the last max_traces
+    traces are kept. With path set, every finished span is also appended to
+    that JSONL file.
+    """
+
+    def __init__(self, max_traces=200, path=None):
+        self.max_traces = max_traces
+        self.path = path
+        self._traces = OrderedDict()  # trace_id -> [span, ...]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, kind="internal", **attributes):
+        parent = _current_span.get()
+        span = self._new_span(name, kind, parent, attributes)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span["status"] = "error"
+            span["attributes"]["error"] = repr(e)
+            raise
+        finally:
+            span["duration_ms"] = (time.perf_counter() - start) * 1000
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record(self, name, kind, start, duration_ms, parent=None, **attributes):
+        """Add a span timed elsewhere; start is a time.time() timestamp."""
+        span = self._new_span(name, kind, parent or _current_span.get(), attributes)
+        span["start"] = start
+        span["duration_ms"] = duration_ms
+        self._finish(span)
+        return span
+
+    @staticmethod
+    def _new_span(name, kind, parent, attributes):
+        return {
+            "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent["span_id"] if parent else None,
+            "name": name,
+            "kind": kind,
+            "start": time.time(),
+            "duration_ms": None,
+            "status": "ok",
+            "attributes": dict(attributes),
+        }
+
+    def _finish(self, span):
+        with self._lock:
+            spans = self._traces.setdefault(span["trace_id"], [])
+            spans.append(span)
+            self._traces.move_to_end(span["trace_id"])
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(span, default=str) + "\n")
+
+    def traces(self):
+        """Return the root span of every kept trace, newest first."""
+        with self._lock:
+            roots = [
+                next((s for s in spans if s["parent_id"] is None), None)
+                for spans in self._traces.values()
+            ]
+        return [root for root in reversed(roots) if root is not None]
+
+    def spans(self, trace_id):
+        """Return the spans of a trace ordered by start time."""
+        with self._lock:
+            return sorted(self._traces.get(trace_id, []), key=lambda s: s["start"])
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+    def export_jsonl(self, trace_id=None, otel=False):
+        """Return the spans of one trace, or of all kept traces, as JSONL text."""
+        with self._lock:
+            trace_ids = [trace_id] if trace_id else list(self._traces)
+        lines = []
+        for tid in trace_ids:
+            for span in self.spans(tid):
+                lines.append(json.dumps(to_otel(span) if otel else span, default=str))
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+def to_otel(span):
+    """Convert a span to the OpenTelemetry JSON (OTLP) span layout."""
+    start_ns = int(span["start"] * 1e9)
+    return {
+        "traceId": span["trace_id"],
+        "spanId": span["span_id"],
+        "parentSpanId": span["parent_id"] or "",
+        "name": span["name"],
+        "kind": {"llm": 3, "db": 3}.get(span["kind"], 1),  # CLIENT or INTERNAL
+        "startTimeUnixNano": start_ns,
+        "endTimeUnixNano": start_ns + int((span["duration_ms"] or 0) * 1e6),
+        "attributes": [
+            {"key": key, "value": {"stringValue": json.dumps(value, default=str)}}
+            for key, value in span["attributes"].items()
+        ],
+        "status": {"code": 2 if span["status"] == "error" else 1},
+    }
+
+
+# Process-wide tracer used by DBManager, the extraction chains and Demo.py
+tracer = Tracer()
+
+
+def traced_runnable(runnable, name, kind="chain"):
+    """Wrap a runnable so each invoke is recorded as a span of the current trace."""
+    from langchain_core.runnables import RunnableLambda
+
+    def invoke(inputs, config):
+        if _current_span.get() is None:
+            return runnable.invoke(inputs, config)
+        with tracer.span(name, kind):
+            return runnable.invoke(inputs, config)
+
+    return RunnableLambda(invoke, name=name)
+
+
+@functools.lru_cache(maxsize=None)
+def _token_usage_handler_class():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TokenUsageHandler(BaseCallbackHandler):
+        """Record each chat model call in the current trace with its token usage."""
+
+        def __init__(self, tracer):
+            self.tracer = tracer
+            self._runs = {}  # run_id -> (parent span, start, perf start, model)
+            self._lock = threading.Lock()
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            parent = _current_span.get()
+            if parent is None:
+                return
+            model = (kwargs.get("metadata") or {}).get("ls_model_name") or (
+                serialized or {}
+            ).get("name")
+            with self._lock:
+                self._runs[run_id] = (parent, time.time(), time.perf_counter(), model)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._end(run_id, response=response)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error=error)
+
+        def _end(self, run_id, response=None, error=None):
+            with self._lock:
+                run = self._runs.pop(run_id, None)
+            if run is None:
+                return
+            parent, start, perf_start, model = run
+            attributes = {"model": model}
+            if response is not None:
+                attributes.update(_token_usage(response))
+            span = self.tracer.record(
+                "llm",
+                "llm",
+                start,
+                (time.perf_counter() - perf_start) * 1000,
+                parent=parent,
+                **attributes,
+            )
+            if error is not None:
+                span["status"] = "error"
+                span["attributes"]["error"] = repr(error)
+
+    return TokenUsageHandler
+
+
+def _token_usage(response):
+    # Providers report usage on the message (usage_metadata) or in llm_output
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                return {
+                    "input_tokens": usage.get("input_tokens", 0),
+                    "output_tokens": usage.get("output_tokens", 0),
+                }
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return {
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+    }
+
+
+def token_usage_handler():
+    """Return a LangChain callback handler that adds LLM spans to the tracer."""
+    return _token_usage_handler_class()(tracer)
@@ -0,0 +1,111 @@
+"""End-to-end agent throughput with the offline fake model.
+
+Runs the real create_react_agent loop, tools and DBManager on a throwaway
+database, with FakeChatModel standing in for the provider. Its latency is
+injected, so differences between runs come from this code rather than the
+network. Use --latency 0 to measure the overhead of the app alone, and
+--stream to run turns the way the Demo page does and also report time to
+first token.
+
+Usage:
+    python -m benchmarks.bench_agent_e2e --prompts 50 --threads 4 --latency 0.2
+    python -m benchmarks.bench_agent_e2e --latency 0.5 --tokens-per-second 50 --stream
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage
+
+from backend.db_manager import get_db_manager
+from backend.fast_extractor import FastExtractor
+from backend.sqlite_agent import (
+    build_agent,
+    create_default_tools,
+    create_extraction_chain,
+    create_llm,
+)
+from backend.streaming import stream_agent
+
+PROMPTS = [
+    "Bob Smith wants to buy 2 Smartphones.",
+    "Show me the purchase records of Alice Johnson",
+    "Please add Ted Mosbi, 22 years old, ted@example.com",
+    "List all products",
+    "Charlie Brown bought a Tablet.",
+    "Which members do we have?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per call")
+    parser.add_argument("--latency-jitter", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument(
+        "--stream", action="store_true", help="stream tokens as the Demo page does"
+    )
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        db_manager = get_db_manager(os.path.join(tmp, "bench.db"))
+        llm = create_llm(
+            "Fake",
+            {
+                "latency": args.latency,
+                "latency_jitter": args.latency_jitter,
+                "tokens_per_second": args.tokens_per_second,
+            },
+        )
+        extraction_chain = create_extraction_chain(
+            llm, cache=None, fast_path=FastExtractor(db_manager)
+        )
+        agent = build_agent(llm, create_default_tools(extraction_chain, db_manager))
+
+        def run(prompt):
+            start = time.perf_counter()
+            inputs = {"messages": [HumanMessage(content=prompt)]}
+            if not args.stream:
+                result = agent.invoke(inputs)
+                return time.perf_counter() - start, None, len(result["messages"])
+            first_token, messages = None, 1
+            for kind, event in stream_agent(agent, inputs):
+                if kind == "token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif kind == "step":
+                    messages += sum(len(u["messages"]) for u in event.values())
+            return time.perf_counter() - start, first_token, messages
+
+        prompts = [PROMPTS[i % len(PROMPTS)] for i in range(args.prompts)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            results = list(pool.map(run, prompts))
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    latencies = sorted(latency for latency, _, _ in results)
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+    print(
+        f"{args.prompts} prompts on {args.threads} threads, "
+        f"{args.latency:.2f}s model latency"
+    )
+    print(f"  throughput  {args.prompts / elapsed:8.1f} prompts/s")
+    print(f"  median      {statistics.median(latencies) * 1000:8.1f} ms")
+    print(f"  p95         {p95 * 1000:8.1f} ms")
+    first_tokens = [first for _, first, _ in results if first is not None]
+    if first_tokens:
+        print(f"  first token {statistics.median(first_tokens) * 1000:8.1f} ms median")
+    print(f"  messages    {statistics.mean(n for _, _, n in results):8.1f} per prompt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Agent start-up time with and without the compiled-graph cache.
+
+Simulates sessions that each build the default tools and an agent for the
+same model, as Demo.py create_agent() does.
+
+Usage:
+    python -m benchmarks.bench_agent_startup --sessions 20
+"""
+
+import argparse
+import time
+
+from langgraph.prebuilt import create_react_agent
+
+from backend.fake_llm import FakeChatModel
+from backend.sqlite_agent import (
+    build_agent,
+    create_default_tools,
+    create_extraction_chain,
+    system_prompt,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+    llm = FakeChatModel()
+
+    for label, build in [
+        (
+            "uncached",
+            lambda tools: create_react_agent(llm, tools, state_modifier=system_prompt),
+        ),
+        ("cached", lambda tools: build_agent(llm, tools)),
+    ]:
+        timings = []
+        for _ in range(args.sessions):
+            start = time.perf_counter()
+            build(create_default_tools(create_extraction_chain(llm)))
+            timings.append(time.perf_counter() - start)
+        print(
+            f"{label:>9}: first session {timings[0] * 1000:.1f} ms, "
+            f"later sessions {sum(timings[1:]) / max(1, len(timings) - 1) * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
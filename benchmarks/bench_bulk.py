@@ -0,0 +1,85 @@
+"""Insert throughput of per-row commits vs. batched and group-committed writes.
+
+Usage:
+    python -m benchmarks.bench_bulk --rows 2000 --threads 8
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from backend.db_manager import DBManager
+
+
+def timed(label, rows, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>28} {rows / elapsed:>12.0f} rows/s")
+
+
+def concurrent_inserts(db_manager, rows, threads):
+    def worker():
+        for _ in range(rows // threads):
+            db_manager.insert_record(1, 1, 1)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--group-commit-ms", type=float, default=5)
+    parser.add_argument("--profile", default="default")
+    args = parser.parse_args()
+    rows = [(1, 1, 1)] * args.rows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DBManager(os.path.join(tmp, "bench.db"), profile=args.profile)
+        db_manager.create_tables()
+
+        def single():
+            for row in rows:
+                db_manager.insert_record(*row)
+
+        def in_transaction():
+            with db_manager.transaction():
+                for row in rows:
+                    db_manager.insert_record(*row)
+
+        timed("insert_record", args.rows, single)
+        timed("insert_record in transaction", args.rows, in_transaction)
+        timed(
+            "insert_records_many",
+            args.rows,
+            lambda: db_manager.insert_records_many(rows),
+        )
+        timed(
+            f"{args.threads} threads, per-row commit",
+            args.rows,
+            lambda: concurrent_inserts(db_manager, args.rows, args.threads),
+        )
+        db_manager.close()
+
+        grouped = DBManager(
+            os.path.join(tmp, "bench.db"),
+            profile=args.profile,
+            group_commit_ms=args.group_commit_ms,
+        )
+        timed(
+            f"{args.threads} threads, group commit",
+            args.rows,
+            lambda: concurrent_inserts(grouped, args.rows, args.threads),
+        )
+        grouped.close()
+
+
+if __name__ == "__main__":
+    main()
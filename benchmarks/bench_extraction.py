@@ -0,0 +1,88 @@
+"""Latency and prompt size of the Purchase extraction variants.
+
+Compares the sequential member/product chains, the parallel chain and the
+single-call PurchaseIntent chain. The LLM is replaced by a stand-in whose
+structured output sleeps for a fixed delay, so the numbers reflect
+round-trips rather than model speed. Prompt size counts the characters of the
+messages plus the JSON schema sent with each call, a proxy for input tokens.
+
+Usage:
+    python -m benchmarks.bench_extraction --delay 0.5 --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from backend.sqlite_agent import create_extraction_chain
+
+TEXT = {"text": "Bob Smith wants to buy 2 Smartphones."}
+
+
+class DelayedLLM:
+    """Minimal stand-in for a chat model that only supports structured output and tool calling."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.prompt_chars = 0
+
+    def bind_tools(self, tools, **kwargs):
+        # Present so the single-call PurchaseIntent chain is used
+        return self
+
+    def with_structured_output(self, schema):
+        schema_chars = len(json.dumps(schema.model_json_schema()))
+
+        def respond(prompt):
+            self.prompt_chars += len(prompt.to_string()) + schema_chars
+            time.sleep(self.delay)
+            return schema.model_construct()
+
+        return RunnableLambda(respond)
+
+
+def measure(llm, func, runs):
+    timings = []
+    llm.prompt_chars = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), llm.prompt_chars // runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds per call")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    llm = DelayedLLM(args.delay)
+    chains = create_extraction_chain(llm, cache=None, fast_path=False)
+
+    def sequential():
+        chains["member_extraction_chain"].invoke(TEXT)
+        chains["product_extraction_chain"].invoke(TEXT)
+
+    def parallel():
+        chains["purchase_extraction_chain"].invoke(TEXT)
+
+    def combined():
+        chains["purchase_intent_chain"].invoke(TEXT)
+
+    print(f"LLM delay: {args.delay:.2f}s")
+    print(f"{'chain':>12} {'latency':>9} {'prompt chars':>13}")
+    for name, func in [
+        ("sequential", sequential),
+        ("parallel", parallel),
+        ("combined", combined),
+    ]:
+        latency, prompt_chars = measure(llm, func, args.runs)
+        print(f"{name:>12} {latency:>8.3f}s {prompt_chars:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Cold-start import time of the backend modules, measured with -X importtime.
+
+Each run imports the module in a fresh interpreter and parses the
+interpreter's import timings: the total, the slowest top-level imports and
+whether any provider library or other heavy dependency that should only load
+on demand was imported. Exits 1 if the median exceeds --budget-ms or a
+lazily loaded module was imported eagerly.
+
+Usage:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --module backend.db_manager --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use only: the provider clients by create_llm, streamlit by
+# recreate_agent and pandas by the DBManager methods returning DataFrames
+LAZY_MODULES = [
+    "langchain_openai",
+    "langchain_ollama",
+    "langchain_community",
+    "boto3",
+    "streamlit",
+    "pandas",
+]
+
+
+def import_times(module, cwd):
+    """Import the module in a new interpreter and return {name: (self_us, cumulative_us, depth)}."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="backend.sqlite_agent")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--budget-ms", type=float, help="fail if the median import time is higher"
+    )
+    args = parser.parse_args()
+
+    # The first run also warms the bytecode caches; it is not counted
+    totals, runs = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs + 1):
+            times = import_times(args.module, tmp)
+            if i:
+                totals.append(times[args.module][1] / 1000)
+                runs.append(times)
+
+    median = statistics.median(totals)
+    print(
+        f"import {args.module}: median {median:.0f} ms, "
+        f"min {min(totals):.0f} ms over {args.runs} runs"
+    )
+
+    # Slowest direct and indirect imports of the last run, by cumulative time
+    times = runs[-1]
+    depth = times[args.module][2]
+    children = [
+        (cumulative, name)
+        for name, (_, cumulative, d) in times.items()
+        if d == depth + 1
+    ]
+    print(f"slowest imports below {args.module}:")
+    for cumulative, name in sorted(children, reverse=True)[: args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in times]
+    if eager:
+        print(f"imported eagerly: {', '.join(eager)}")
+
+    failed = bool(eager) or (args.budget_ms is not None and median > args.budget_ms)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
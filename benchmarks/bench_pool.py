@@ -0,0 +1,91 @@
+"""Read throughput of a shared-connection DBManager vs. a pooled one.
+
+Usage:
+    python -m benchmarks.bench_pool --members 2000 --records 50000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from backend.db_manager import DBManager
+
+
+def seed(db_name, members, products, records):
+    db_manager = DBManager(db_name)
+    db_manager.create_tables()
+    with db_manager._writer() as conn:
+        conn.executemany(
+            "INSERT INTO member (name, email, age) VALUES (?, ?, ?)",
+            [
+                (f"Member {i}", f"member{i}@example.com", 20 + i % 50)
+                for i in range(members)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO product (name, price) VALUES (?, ?)",
+            [(f"Product {i}", 1.0 + i) for i in range(products)],
+        )
+        conn.executemany(
+            "INSERT INTO record (member_id, product_id, number) VALUES (?, ?, ?)",
+            [
+                (random.randint(1, members), random.randint(1, products), 1)
+                for _ in range(records)
+            ],
+        )
+    db_manager.close()
+
+
+def read_workload(db_manager, members, n_ops):
+    for _ in range(n_ops):
+        i = random.randrange(members)
+        member = db_manager.get_member_by_name(f"Member {i}")
+        if member:
+            db_manager.get_member_records(member[0])
+
+
+def run(db_manager, threads, members, ops_per_thread):
+    workers = [
+        threading.Thread(
+            target=read_workload, args=(db_manager, members, ops_per_thread)
+        )
+        for _ in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops_per_thread / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--ops", type=int, default=200, help="reads per thread")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        seed(db_name, args.members, args.products, args.records)
+
+        print(f"{'threads':>8} {'shared ops/s':>14} {'pooled ops/s':>14}")
+        for threads in args.threads:
+            shared = DBManager(db_name)
+            pooled = DBManager(db_name, pool_size=threads)
+            shared_rate = run(shared, threads, args.members, args.ops)
+            pooled_rate = run(pooled, threads, args.members, args.ops)
+            shared.close()
+            pooled.close()
+            print(f"{threads:>8} {shared_rate:>14.0f} {pooled_rate:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
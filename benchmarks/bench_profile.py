@@ -0,0 +1,74 @@
+"""Mixed read/write throughput of the "default" vs "production" DBManager profiles.
+
+One writer thread inserts purchase records one commit at a time while reader
+threads reload the dashboard frames, mirroring Demo.py load_data() running
+next to the agent.
+
+Usage:
+    python -m benchmarks.bench_profile --seconds 5 --readers 2
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from backend.db_manager import DBManager
+from benchmarks.bench_pool import seed
+
+
+def writer_loop(db_manager, stop, counter):
+    while not stop.is_set():
+        db_manager.insert_record(1, 1, 1)
+        counter[0] += 1
+
+
+def reader_loop(db_manager, stop, counter):
+    while not stop.is_set():
+        db_manager.list_all_members()
+        db_manager.get_member_records(1)
+        counter[0] += 1
+
+
+def run(db_name, profile, readers, seconds):
+    # Separate managers, like the agent and the dashboard in the Streamlit app
+    writer = DBManager(db_name, profile=profile)
+    reader = DBManager(db_name, pool_size=readers, profile=profile)
+    stop = threading.Event()
+    writes, reads = [0], [0]
+    threads = [threading.Thread(target=writer_loop, args=(writer, stop, writes))]
+    threads += [
+        threading.Thread(target=reader_loop, args=(reader, stop, reads))
+        for _ in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    reader.close()
+    return writes[0] / seconds, reads[0] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'profile':>12} {'writes/s':>10} {'reads/s':>10}")
+    for profile in ["default", "production"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_name = os.path.join(tmp, "bench.db")
+            seed(db_name, args.members, 100, args.records)
+            writes, reads = run(db_name, profile, args.readers, args.seconds)
+            print(f"{profile:>12} {writes:>10.0f} {reads:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
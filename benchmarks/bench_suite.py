@@ -0,0 +1,238 @@
+"""Time DBManager methods across database sizes and flag regressions.
+
+Databases are built once per size with benchmarks.generate_data and cached in
+--data-dir; each run works on a copy, migrated to the current schema, so
+inserts do not accumulate. Results
+are written as JSON, and medians that are slower than the stored baseline by
+more than --threshold are reported as regressions (exit status 1).
+
+Usage:
+    python -m benchmarks.bench_suite --sizes 10000 100000 1000000
+    python -m benchmarks.bench_suite --save-baseline
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from backend.db_manager import MIGRATIONS, DBManager
+from benchmarks.generate_data import generate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Differences below this are timer noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+
+def build_operations(db_manager, rng):
+    # name -> (runs, callable); full-table reads get fewer runs
+    with db_manager._reader() as conn:
+        names = [row[0] for row in conn.execute("SELECT name FROM member")]
+        products = [row[0] for row in conn.execute("SELECT name FROM product")]
+        member_count = len(names)
+    counter = itertools.count()
+
+    def typo(name):
+        i = rng.randrange(len(name))
+        return name[:i] + name[i + 1 :]
+
+    def new_name():
+        return f"Benchmark Member {next(counter)}"
+
+    return {
+        "get_member_by_name": (
+            200,
+            lambda: db_manager.get_member_by_name(rng.choice(names)),
+        ),
+        "get_product_by_name": (
+            200,
+            lambda: db_manager.get_product_by_name(rng.choice(products)),
+        ),
+        "find_member": (50, lambda: db_manager.find_member(typo(rng.choice(names)))),
+        "get_member_records": (
+            200,
+            lambda: db_manager.get_member_records(rng.randint(1, member_count)),
+        ),
+        "page_rows": (
+            100,
+            lambda: db_manager.page_rows("member", name_prefix=rng.choice(names)[:3]),
+        ),
+        "member_product_totals": (
+            50,
+            lambda: db_manager.member_product_totals([rng.choice(names)]),
+        ),
+        "list_all_members": (3, db_manager.list_all_members),
+        "list_all_products": (20, db_manager.list_all_products),
+        "list_all_records": (3, db_manager.list_all_records),
+        "insert_member": (
+            100,
+            lambda: db_manager.insert_member(new_name(), "b@example.com", 30),
+        ),
+        "get_or_create_member": (
+            100,
+            lambda: db_manager.get_or_create_member(
+                rng.choice(names), "b@example.com", 30
+            ),
+        ),
+        "insert_record": (
+            100,
+            lambda: db_manager.insert_record(rng.randint(1, member_count), 1, 1),
+        ),
+        "insert_records_many_1000": (
+            10,
+            lambda: db_manager.insert_records_many(
+                [(rng.randint(1, member_count), 1, 1) for _ in range(1000)]
+            ),
+        ),
+    }
+
+
+def time_operation(func, runs):
+    func()  # warm the page cache and statement cache
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": runs,
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(int(runs * 0.95), runs - 1)],
+        "min_ms": samples[0],
+    }
+
+
+def cached_database(data_dir, records, seed):
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"records_{records}_seed_{seed}.db")
+    if not os.path.exists(path):
+        print(f"Generating {path}...", flush=True)
+        partial = path + ".partial"
+        for leftover in [partial, partial + "-wal", partial + "-shm"]:
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        generate(partial, records, seed=seed)
+        os.replace(partial, path)
+    return path
+
+
+def run_size(path, operations, seed, profile, result_cache_mb=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        shutil.copy(path, db_name)
+        db_manager = DBManager(
+            db_name, profile=profile, result_cache_mb=result_cache_mb
+        )
+        # Databases cached before a schema change are timed on the new schema
+        db_manager.migrate()
+        ops = build_operations(db_manager, random.Random(seed))
+        results = {}
+        for name, (runs, func) in ops.items():
+            if operations and name not in operations:
+                continue
+            results[name] = time_operation(func, runs)
+            print(f"  {name:<26} {results[name]['median_ms']:>10.3f} ms", flush=True)
+        db_manager.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Return [(size, operation, baseline ms, current ms)] for slower medians
+    regressions = []
+    for size, operations in results.items():
+        for name, current in operations.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                continue
+            before, after = previous["median_ms"], current["median_ms"]
+            if after > before * (1 + threshold) and after - before > NOISE_FLOOR_MS:
+                regressions.append((size, name, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--operations", nargs="+", help="default: all")
+    parser.add_argument("--profile", default="production")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--result-cache-mb",
+        type=float,
+        help="measure with DBManager's result cache (default: without)",
+    )
+    parser.add_argument("--data-dir", default=os.path.join(HERE, "data"))
+    parser.add_argument("--output", default=os.path.join(HERE, "results.json"))
+    parser.add_argument("--baseline", default=os.path.join(HERE, "baseline.json"))
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="also write results to --baseline"
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for records in args.sizes:
+        print(f"{records} records")
+        path = cached_database(args.data_dir, records, args.seed)
+        results[str(records)] = run_size(
+            path, args.operations, args.seed, args.profile, args.result_cache_mb
+        )
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "schema_version": len(MIGRATIONS),
+            "platform": platform.platform(),
+            "profile": args.profile,
+            "result_cache_mb": args.result_cache_mb,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline first.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    schema_version = baseline["meta"].get("schema_version")
+    if schema_version != len(MIGRATIONS):
+        print(
+            f"The baseline was taken on schema version {schema_version}, not "
+            f"{len(MIGRATIONS)}; run with --save-baseline to compare again."
+        )
+        return
+    regressions = compare(results, baseline["results"], args.threshold)
+    for size, name, before, after in regressions:
+        print(
+            f"REGRESSION {name} at {size} records: {before:.3f} ms -> {after:.3f} ms "
+            f"({after / before - 1:+.0%})"
+        )
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
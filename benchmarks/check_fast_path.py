@@ -0,0 +1,70 @@
+"""Assert what the rule-based fast path extracts from typical member inputs.
+
+Each input is run through FastExtractor.extract_user against the example
+data. None means the text must go to the LLM: a wrong member taken from the
+fast path would be written without anyone checking it. Exits non-zero if an
+input is not handled as expected.
+
+Usage:
+    python -m benchmarks.check_fast_path
+"""
+
+import sys
+
+from backend.db_manager import DBManager
+from backend.fast_extractor import FastExtractor
+
+# Input -> expected UserInfo fields, or None to fall back to the LLM
+EXPECTED_USERS = {
+    "Show me the purchase records of Alice Johnson": {
+        "name": "Alice Johnson",
+        "email": None,
+        "age": None,
+    },
+    "Bob Smith, 30 years old, bob@example.com": {
+        "name": "Bob Smith",
+        "email": "bob@example.com",
+        "age": 30,
+    },
+    "Please add Ted Mosbi, 22 years old, ted@example.com": {
+        "name": "Ted Mosbi",
+        "email": "ted@example.com",
+        "age": 22,
+    },
+    "Ted Mosbi (age 22), email: t@x.com": {
+        "name": "Ted Mosbi",
+        "email": "t@x.com",
+        "age": 22,
+    },
+    # A known name followed by more name words may be a new member
+    "A new member, Alice Johnson Smith, 30 years old, email: ajs@x.com": None,
+    "Add Bob Smith Jr, 40 years old, email: bsj@x.com": None,
+    # Another email or age than the stored one may be another person
+    "Bob Smith, 99 years old, email: other@x.com": None,
+    # Words opening the request are not part of the new member's name
+    "Register Ted Mosbi, 22 years old, email: t@x.com": None,
+    "New Member Ted Mosbi, 22 years old, email: t@x.com": None,
+    "Add Ted Mosbi Van Der Berg, 22 years old, email: t@x.com": None,
+    # A new member needs every field
+    "Ted Mosbi, 22 years old": None,
+}
+
+
+def main():
+    db_manager = DBManager(":memory:")
+    db_manager.create_tables()
+    extractor = FastExtractor(db_manager)
+
+    failures = 0
+    for text, expected in EXPECTED_USERS.items():
+        user = extractor.extract_user(text)
+        ok = user == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {text!r}: {user}")
+
+    db_manager.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Assert that the DBManager lookups use the indexes from the schema migrations.
+
+Every statement a lookup method runs is captured with a trace callback and
+re-planned with EXPLAIN QUERY PLAN. Exits non-zero if a lookup falls back to
+a full table scan or sorts its result in a temporary b-tree.
+
+Usage:
+    python -m benchmarks.check_query_plans
+"""
+
+import sys
+
+from backend.db_manager import MIGRATIONS, DBManager
+
+# Method call -> substring every matching plan must contain
+EXPECTED_PLANS = {
+    "get_member_by_name": (
+        ("Alice Johnson",),
+        {"member": "USING INDEX idx_member_name (name=?)"},
+    ),
+    "get_product_by_name": (
+        ("Laptop",),
+        {"product": "USING INDEX idx_product_name (name=?)"},
+    ),
+    "get_member_records": (
+        (1,),
+        {
+            "record": "USING COVERING INDEX idx_record_member (member_id=?)",
+            "product": "USING INTEGER PRIMARY KEY (rowid=?)",
+        },
+    ),
+}
+
+
+def captured_statements(db_manager, method, args):
+    statements = []
+    db_manager.conn.set_trace_callback(statements.append)
+    getattr(db_manager, method)(*args)
+    db_manager.conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def main():
+    db_manager = DBManager(":memory:")
+    db_manager.create_tables()
+    assert db_manager.schema_version() == len(MIGRATIONS)
+
+    failures = 0
+    for method, (args, expected) in EXPECTED_PLANS.items():
+        plan = []
+        for sql in captured_statements(db_manager, method, args):
+            plan += db_manager.explain_query_plan(sql)
+        for table, detail in expected.items():
+            steps = [step for step in plan if f" {table} " in f" {step} "]
+            ok = bool(steps) and all(detail in step for step in steps)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {method}: {steps}")
+        sorts = [step for step in plan if "TEMP B-TREE" in step]
+        failures += bool(sorts)
+        if sorts:
+            print(f"FAIL {method}: {sorts}")
+
+    db_manager.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
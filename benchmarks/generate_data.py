@@ -0,0 +1,147 @@
+"""Build a customer database of a given size with skewed, realistic-looking data.
+
+Member and product popularity follow a Zipf distribution, so a few members
+buy most often and a few products sell most, as in real purchase logs.
+
+Usage:
+    python -m benchmarks.generate_data --records 1000000 --output big.db
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from backend.db_manager import DBManager
+
+FIRST_NAMES = [
+    "Alice", "Bob", "Charlie", "Diana", "Ethan", "Fiona", "George", "Hannah",
+    "Ivan", "Julia", "Kevin", "Laura", "Marco", "Nina", "Oscar", "Paula",
+    "Quentin", "Rosa", "Samuel", "Tina", "Umar", "Vera", "Walter", "Xenia",
+    "Yusuf", "Zoe", "Andy", "Ted", "Mei", "Ravi", "Sofia", "Lucas",
+]  # fmt: skip
+LAST_NAMES = [
+    "Johnson", "Smith", "Brown", "Tsao", "Garcia", "Miller", "Davis", "Lopez",
+    "Wilson", "Anderson", "Thomas", "Moore", "Martin", "Lee", "Clark", "Lewis",
+    "Walker", "Hall", "Young", "King", "Wright", "Scott", "Green", "Baker",
+    "Mosbi", "Nguyen", "Patel", "Kim", "Chen", "Rossi", "Novak", "Silva",
+]  # fmt: skip
+PRODUCT_KINDS = [
+    "Laptop", "Phone", "Tablet", "Monitor", "Keyboard", "Mouse", "Headphones",
+    "Speaker", "Camera", "Charger", "Cable", "Watch", "Router", "Printer",
+]  # fmt: skip
+PRODUCT_BRANDS = [
+    "Acme", "Globex", "Initech", "Umbrella", "Stark", "Wayne", "Hooli", "Vandelay",
+]  # fmt: skip
+CHUNK = 100_000
+
+
+def default_sizes(records):
+    # Roughly 20 purchases per member and a catalogue that grows slowly
+    return max(records // 20, 10), max(int(records**0.5), 10)
+
+
+def member_rows(rng, n):
+    # Unique names: every first/last combination first, then numbered ones
+    combos = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    rng.shuffle(combos)
+    for i in range(n):
+        name = (
+            combos[i]
+            if i < len(combos)
+            else f"{combos[i % len(combos)]} {i // len(combos) + 1}"
+        )
+        email = name.lower().replace(" ", ".") + "@example.com"
+        age = int(np.clip(rng.normal(38, 12), 18, 90))
+        yield name, email, age
+
+
+def product_rows(rng, n):
+    combos = [f"{brand} {kind}" for kind in PRODUCT_KINDS for brand in PRODUCT_BRANDS]
+    rng.shuffle(combos)
+    for i in range(n):
+        name = (
+            combos[i]
+            if i < len(combos)
+            else f"{combos[i % len(combos)]} {i // len(combos) + 1}"
+        )
+        price = round(float(rng.lognormal(4.5, 1.0)), 2)
+        yield name, price
+
+
+def zipf_ids(rng, n_items, size, skew):
+    # Sample ids 1..n_items where the k-th most popular item has weight 1/k**skew.
+    # Popularity ranks are shuffled so popular ids are spread over the table.
+    weights = 1.0 / np.arange(1, n_items + 1) ** skew
+    cumulative = np.cumsum(weights / weights.sum())
+    ranks = np.searchsorted(cumulative, rng.random(size), side="right")
+    ranks = np.minimum(ranks, n_items - 1)
+    return rng.permutation(n_items)[ranks] + 1
+
+
+def generate(
+    db_name,
+    records,
+    members=None,
+    products=None,
+    member_skew=1.1,
+    product_skew=1.3,
+    seed=0,
+):
+    """Create db_name with the given number of rows and return the row counts."""
+    default_members, default_products = default_sizes(records)
+    members = members or default_members
+    products = products or default_products
+    rng = np.random.default_rng(seed)
+
+    db_manager = DBManager(db_name, profile="production")
+    db_manager.migrate()
+    with db_manager.transaction():
+        db_manager.insert_members_many(member_rows(rng, members))
+        db_manager.insert_products_many(product_rows(rng, products))
+    for start in range(0, records, CHUNK):
+        size = min(CHUNK, records - start)
+        batch = zip(
+            zipf_ids(rng, members, size, member_skew).tolist(),
+            zipf_ids(rng, products, size, product_skew).tolist(),
+            # Most purchases are a single item, a few are bulk orders
+            rng.geometric(0.6, size).tolist(),
+        )
+        db_manager.insert_records_many(batch)
+    db_manager.close()
+    return {"members": members, "products": products, "records": records}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--members", type=int, help="default: records / 20")
+    parser.add_argument("--products", type=int, help="default: sqrt(records)")
+    parser.add_argument("--member-skew", type=float, default=1.1)
+    parser.add_argument("--product-skew", type=float, default=1.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="customer_database.db")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        parser.error(f"{args.output} already exists")
+    start = time.perf_counter()
+    counts = generate(
+        args.output,
+        args.records,
+        args.members,
+        args.products,
+        args.member_skew,
+        args.product_skew,
+        args.seed,
+    )
+    print(
+        f"Wrote {counts['members']} members, {counts['products']} products and "
+        f"{counts['records']} records to {args.output} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import streamlit as st
 from backend.sqlite_agent import create_tool_from_code
 from code_editor import code_editor
 
-from backend.sqlite_agent import recreate_agent
+from backend.sqlite_agent import recreate_agent, tool_sandbox
 
 
 # Define the function to remove a tool by its index
@@ -123,14 +123,23 @@ new_tool = StructuredTool.from_function(
 
 # Save button outside the editor
 st.write("Before you save the tool, remember to save the code first.")
+st.caption(
+    f"Custom tools run in separate worker processes: each call is stopped after "
+    f"{tool_sandbox.timeout:g}s, may use up to {tool_sandbox.memory_mb} MB and its "
+    f"result is cut at {tool_sandbox.max_result_chars} characters."
+)
 if st.button("Save Tool"):
     if response_dict:  # Check if the editor returned valid data
         code_content = response_dict.get("text", "")  # Get the code content
         if code_content:
             # Process the code content (for example, save it or validate it)
-            new_tool = create_tool_from_code(code_content)
-            st.session_state.agent = recreate_agent(new_tool)
-            st.rerun()
+            try:
+                new_tool = create_tool_from_code(code_content)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.session_state.agent = recreate_agent(new_tool)
+                st.rerun()
 
 # Display available functions
 st.write("### Available Functions")
@@ -144,8 +153,9 @@ age = 22
 email = 'example@example.com'
 product_name = 'iPhone'
 price = '2000'  
-db_manager.insert_member(member_name, age, email)
-db_manager.insert_product(product_name, price)
+db_manager.insert_member(member_name, email, age)  # returns the inserted row
+db_manager.insert_product(product_name, price)  # returns the inserted row
+db_manager.get_or_create_member(member_name, email, age)  # returns (row, created)
 db_manager.get_member_by_name(name)
 db_manager.get_product_by_name(product_name)
 db_manager.list_all_members()
@@ -228,8 +238,7 @@ def insert_product(text: str) -> str:
         return f'Product {product_info.name} already exists with ID: {product[0]}'
     else:
         # Insert the extracted product information into the database
-        db_manager.insert_product(product_info.name, product_info.price)
-        new_product = db_manager.get_product_by_name(product_info.name)
+        new_product = db_manager.insert_product(product_info.name, product_info.price)
         return f'Extracted and inserted product info: {new_product}'
 
 # Create the tool using the StructuredTool wrapper
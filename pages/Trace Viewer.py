@@ -0,0 +1,113 @@
+import json
+from datetime import datetime
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from backend.tracing import tracer
+
+st.set_page_config(layout="wide")
+st.write("## Trace Viewer")
+st.write(
+    "Every chat request is traced: the agent steps, extraction chains, LLM calls "
+    "with their token usage and DBManager queries with their SQL."
+)
+
+traces = tracer.traces()
+if not traces:
+    st.info("No traces yet. Send a message on the Demo page to record one.")
+    st.stop()
+
+
+def trace_label(root):
+    started = datetime.fromtimestamp(root["start"]).strftime("%H:%M:%S")
+    prompt = root["attributes"].get("prompt", root["name"])
+    return f"{started} · {root['duration_ms']:.0f} ms · {prompt[:60]}"
+
+
+root = st.selectbox("Request", traces, format_func=trace_label)
+spans = tracer.spans(root["trace_id"])
+
+# Depth of each span below the request, for indenting the waterfall labels
+by_id = {span["span_id"]: span for span in spans}
+
+
+def depth(span):
+    level = 0
+    while span["parent_id"] in by_id:
+        span = by_id[span["parent_id"]]
+        level += 1
+    return level
+
+
+rows = []
+for i, span in enumerate(spans):
+    offset = (span["start"] - root["start"]) * 1000
+    rows.append(
+        {
+            "order": i,
+            "span": f"{i:>3} " + "· " * depth(span) + span["name"],
+            "kind": span["kind"],
+            "start_ms": offset,
+            # Sub-millisecond queries still get a visible bar
+            "end_ms": offset + max(span["duration_ms"] or 0, root["duration_ms"] / 200),
+            "duration_ms": span["duration_ms"] or 0,
+            "status": span["status"],
+            "details": json.dumps(span["attributes"], default=str),
+        }
+    )
+frame = pd.DataFrame(rows)
+
+llm = frame[frame["kind"] == "llm"]
+tokens_in = sum(span["attributes"].get("input_tokens", 0) for span in spans)
+tokens_out = sum(span["attributes"].get("output_tokens", 0) for span in spans)
+col1, col2, col3, col4, col5 = st.columns(5)
+col1.metric("Total", f"{root['duration_ms']:.0f} ms")
+col2.metric("LLM calls", f"{len(llm)} · {llm['duration_ms'].sum():.0f} ms")
+col3.metric(
+    "DB queries",
+    f"{(frame['kind'] == 'db').sum()} · "
+    f"{frame.loc[frame['kind'] == 'db', 'duration_ms'].sum():.1f} ms",
+)
+col4.metric("Tokens in / out", f"{tokens_in} / {tokens_out}")
+first_token_ms = root["attributes"].get("time_to_first_token_ms")
+col5.metric(
+    "First token", "–" if first_token_ms is None else f"{first_token_ms:.0f} ms"
+)
+
+# Waterfall: one bar per span, positioned by its start relative to the request
+chart = (
+    alt.Chart(frame)
+    .mark_bar()
+    .encode(
+        x=alt.X("start_ms:Q", title="ms since request start"),
+        x2="end_ms:Q",
+        y=alt.Y("span:N", sort=alt.SortField("order"), title=None),
+        color="kind:N",
+        tooltip=["span", "kind", alt.Tooltip("duration_ms:Q", format=".2f"), "details"],
+    )
+    .properties(height=max(200, 24 * len(frame)))
+)
+st.altair_chart(chart, use_container_width=True)
+
+st.markdown("### Spans")
+st.dataframe(
+    frame[["span", "kind", "start_ms", "duration_ms", "status", "details"]],
+    use_container_width=True,
+    hide_index=True,
+)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.download_button(
+        "Download trace (JSONL)",
+        tracer.export_jsonl(root["trace_id"]),
+        file_name=f"trace-{root['trace_id']}.jsonl",
+    )
+with col2:
+    st.download_button(
+        "Download trace (OpenTelemetry JSONL)",
+        tracer.export_jsonl(root["trace_id"], otel=True),
+        file_name=f"trace-{root['trace_id']}.otel.jsonl",
+    )